@@ -1,16 +1,23 @@
-import csv
 import functools
+import multiprocessing
+import os
 import re
+import tempfile
+import traceback
+from collections import namedtuple, Counter
 from enum import Enum
-from itertools import product
 
-import pandas as pd
-from nltk import word_tokenize, pos_tag
+import numpy as np
+from nltk import word_tokenize, pos_tag_sents
 from nltk.corpus import stopwords
 from nltk.tokenize import sent_tokenize
 
+from cohesion_engine import CohesionEngine, StreamingCohesion
 from data.utility.lemmatization_utility import lemmatize_word
-from data.utility.utility import timeit, freezeargs
+from data.utility.metrics import timed_stage
+from data.utility.nasari_vectors import NasariVectors
+from data.utility.similarity_cache import SimilarityCache
+from data.utility.utility import timeit
 
 
 class Granularity(Enum):
@@ -18,163 +25,366 @@ class Granularity(Enum):
     SENTENCE = 1
 
 
-class Summarizer:
+# characters removed before the tokenization (everything but letters and spaces)
+NON_ALPHA_REGEX = re.compile(r"[^\w ]|[\d_]")
 
-    def __init__(self, nasari_file_path):
-        self.nasari = self.__read_nasari(nasari_file_path)
-        self.cached_cohesion = {}
+SummaryResult = namedtuple('SummaryResult', ['source', 'summary', 'error'])
 
-    @staticmethod
-    def __gen_nasari_formatted_rows(stream):
+# Summarizer used by the worker processes of Summarizer.summarize_many
+_worker_summarizer = None
+
+
+class RankedDocument:
+    """
+    A document preprocessed once: its paragraphs, its sentences with their token bags and the paragraph of
+    each sentence. The token bags of the paragraphs are derived from the ones of their sentences, and the cohesion of
+    each granularity is computed the first time it is needed, so the summaries at different percentages and
+    granularities are cut from the same ranking
+    """
+
+    def __init__(self, paragraphs, sentences, sentence_paragraphs, sentence_bags, cohesion_engine, metrics=None):
         """
-        Generator for reading the nasari file
-        :param stream: the file stream
-        :return: [BalbelSyn,Lemma,Features
+        :param paragraphs: list of paragraph texts (the title first)
+        :param sentences: list of sentence texts
+        :param sentence_paragraphs: list with the paragraph index of each sentence
+        :param sentence_bags: list of dict{word: freq}, one for each sentence
+        :param cohesion_engine: the CohesionEngine used for the ranking
+        :param metrics: optional StageMetrics recording the 'cohesion' and 'selection' stages
         """
-        rows = csv.reader(stream)
-        for row in rows:
-            row = row[0].split(";")
-            yield [row[0], row[1].lower(),
-                   dict((lambda fs: (fs[0], float(fs[1]) if len(fs) > 1 else 0))(lx.split("_")) for lx in row[2:])]
+        self.paragraphs = paragraphs
+        self.sentences = sentences
+        self.sentence_paragraphs = sentence_paragraphs
+        self.sentence_bags = sentence_bags
+        self.cohesion_engine = cohesion_engine
+        self.metrics = metrics
+        self.__cohesion = {}
 
-    def __read_nasari(self, file_path):
+    def segments(self, granularity):
         """
-        Read the nasari file as a Dataframe
-        :param file_path:
-        :return: dataframe, each row is (BalbelSyn, Lemma, Dict of Features)
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :return: the list of paragraph or sentence texts
         """
-        with open(file_path) as f:
-            nasari_df = pd.DataFrame.from_records(list(self.__gen_nasari_formatted_rows(f)),
-                                                  columns=['BalbelSyn', 'Lemma', 'Features'], index='BalbelSyn')
-        return nasari_df
+        return self.paragraphs if granularity == Granularity.PARAGRAPH else self.sentences
+
+    def token_bags(self, granularity):
+        """
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :return: list of dict{word: freq}, one for each paragraph or sentence
+        """
+        if granularity == Granularity.SENTENCE:
+            return self.sentence_bags
+        paragraph_bags = [Counter() for _ in self.paragraphs]
+        for p, bag in zip(self.sentence_paragraphs, self.sentence_bags):
+            paragraph_bags[p].update(bag)
+        return [dict(bag) for bag in paragraph_bags]
+
+    def cohesion(self, granularity):
+        """
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :return: numpy array, the cohesion of each paragraph or sentence (0 for the title)
+        """
+        if granularity not in self.__cohesion:
+            with timed_stage(self.metrics, "cohesion"):
+                self.__cohesion[granularity] = self.cohesion_engine.cohesion(self.token_bags(granularity))
+        return self.__cohesion[granularity]
+
+    def summary(self, percentage=0.7, granularity=Granularity.PARAGRAPH):
+        """
+        Cut a summary from the ranking
+        :param percentage: the percentage of relevant information to keep
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :return: a string containing the summary of the document
+        """
+        segments, cohesion = self.segments(granularity), self.cohesion(granularity)
+        with timed_stage(self.metrics, "selection"):
+            return join_segments([segments[p] for p in select_segments(cohesion, percentage)], granularity)
+
+
+class Summarizer:
+
+    def __init__(self, nasari_file_path, similarity_cache=None, metrics=None):
+        """
+        :param nasari_file_path: the nasari text file, or a file compiled with data/utility/nasari_binary.py
+        :param similarity_cache: the SimilarityCache of the word similarities (shared across documents),
+        a new in-memory cache is used if missing
+        :param metrics: optional StageMetrics recording the latency of the preprocess, cohesion, similarity
+        and selection stages
+        """
+        self.nasari_file_path = nasari_file_path
+        self.nasari = NasariVectors.load(nasari_file_path)
+        self.similarity_cache = similarity_cache if similarity_cache is not None else SimilarityCache()
+        self.metrics = metrics
+        self.cohesion_engine = CohesionEngine(self.__similarity, self.nasari.related_lemmas, metrics)
 
     @timeit
     def summarize_document(self, file_path, percentage=0.7, granularity=Granularity.PARAGRAPH):
         """
         Summarized a given document, the paragraph or sentences are ranked based on the cohesion metrics.
         Cohesion is calculated using the nasari vectors similarity of the words.
-        :param file_path: the path of the file to be summarized
+        :param file_path: the path of the file to be summarized (or the text of the document)
         :param percentage: the percentage of relevant information to keep
         :param granularity: the granularity of the analysis (paragraph or sentence)
         :return: a string containing the summary of the document
         """
-        self.cached_cohesion = {}
-        df_document = self.__preprocess_text(file_path, granularity)
-        df_document = self.__compute_cohesion(df_document)
-        df_title = df_document[df_document.index == 0]
-        df_document = df_document[1:].sort_values(by="Cohesion", ascending=False)
-        df_document = df_document[0:int(len(df_document) * percentage)].sort_values(by="Paragraph")
-        summarized_document = pd.concat([df_title,df_document])
-        if granularity == Granularity.PARAGRAPH:
-            return "\n\n".join(list(summarized_document['Sentence']))
-        else:
-            sum_sentences = list(summarized_document['Sentence'])
-            return "{}\n\n".format(sum_sentences[0]) + "\n".join(sum_sentences[1:])
+        return self.rank_document(file_path).summary(percentage, granularity)
 
-    def __preprocess_text(self, file_path, granularity):
+    def rank_document(self, file_path):
         """
-        Transform the document in a dataframe
-        :type granularity: the text granularity level (Paragraph or sentence)
-        :param file_path: the document filepath
-        :return: a dataframe, with row ('Sentence', 'Paragraph', 'Token', 'Cohesion')
+        Preprocess a document once, the returned RankedDocument gives the summaries at any percentage and
+        granularity, computing the cohesion of each granularity only the first time
+        :param file_path: the path of the file to be summarized (or the text of the document)
+        :return: RankedDocument
         """
-        with open(file_path) as f:
-            text = f.read()
-        text = re.sub("#(.*)\n", "", text).strip()  # remove comments
-        if granularity == Granularity.SENTENCE:
-            text_sentences = sent_tokenize(text)
-            text_sentences = [item for r in text_sentences for item in r.split('\n\n')]
-            text_records = [[p_text, p, self.__tokenize(p_text), 0] for (p, p_text) in enumerate(text_sentences)]
+        return self.rank_text(self.__read_document(file_path))
+
+    def rank_text(self, text):
+        """
+        Same as rank_document, but the argument is always the text of the document (never read as a path),
+        so it is safe for untrusted input
+        :param text: the text of the document
+        :return: RankedDocument
+        """
+        with timed_stage(self.metrics, "preprocess"):
+            text = re.sub("#(.*)\n", "", text).strip()  # remove comments
+            paragraphs = text.split("\n\n")
+            sentences, sentence_paragraphs = [], []
+            for p, p_text in enumerate(paragraphs):
+                p_sentences = [item for r in sent_tokenize(p_text) for item in r.split('\n\n')]
+                sentences += p_sentences
+                sentence_paragraphs += [p] * len(p_sentences)
+            sentence_bags = self.__tokenize(sentences)
+        return RankedDocument(paragraphs, sentences, sentence_paragraphs, sentence_bags, self.cohesion_engine,
+                              self.metrics)
+
+    @timeit
+    def summarize_stream(self, stream, percentage=0.7, granularity=Granularity.PARAGRAPH, window=None):
+        """
+        Summarize a (very long) document read as a stream of lines, with bounded memory: the paragraphs are
+        tokenized (sentence by sentence) and added to the running cohesion totals one at a time, their text is spooled to a temporary file
+        and the selection is done at the end, without the paragraph x paragraph cohesion matrix.
+        Without a window the ranking is the same of summarize_document
+        :param stream: iterable of lines (e.g. a file handle or a generator), or the path of the file
+        :param percentage: the percentage of relevant information to keep
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :param window: number of neighbour paragraphs (or sentences), on each side, used for the cohesion
+        (all if None)
+        :return: a string containing the summary of the document
+        """
+        if isinstance(stream, str):
+            with open(stream) as f:
+                return self.summarize_stream(f, percentage, granularity, window)
+        cohesion = StreamingCohesion(self.cohesion_engine, window)
+        spans = []
+        with tempfile.TemporaryFile() as spool:
+            for paragraph in iter_paragraphs(stream):
+                sentences = [item for r in sent_tokenize(paragraph) for item in r.split('\n\n')]
+                sentence_bags = self.__tokenize(sentences)
+                if granularity == Granularity.SENTENCE:
+                    segments, token_bags = sentences, sentence_bags
+                else:
+                    segments, token_bags = [paragraph], [dict(sum(map(Counter, sentence_bags), Counter()))]
+                for segment, token_bag in zip(segments, token_bags):
+                    encoded = segment.encode("utf8")
+                    spans.append((spool.tell(), len(encoded)))
+                    spool.write(encoded)
+                    cohesion.add(token_bag)
+            if not spans:
+                return ""
+            segments = []
+            for p in select_segments(cohesion.scores(), percentage):
+                spool.seek(spans[p][0])
+                segments.append(spool.read(spans[p][1]).decode("utf8"))
+        return join_segments(segments, granularity)
+
+    def summarize_many(self, paths_or_texts, percentage=0.7, granularity=Granularity.PARAGRAPH, processes=None,
+                       chunksize=1):
+        """
+        Summarize a batch of documents with a pool of processes.
+        The workers share the nasari resource of this summarizer: with the fork start method they inherit it
+        (copy-on-write), otherwise they load it from nasari_file_path (memory mapped if compiled).
+        The failure of a document does not stop the batch, it is reported in the error field of its result
+        :param paths_or_texts: iterable of document paths (or texts)
+        :param percentage: the percentage of relevant information to keep
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :param processes: number of worker processes (os.cpu_count() if missing)
+        :param chunksize: number of documents sent to a worker at a time
+        :return: iterator of SummaryResult(source, summary, error), in the same order of the input
+        """
+        global _worker_summarizer
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            _worker_summarizer = self
         else:
-            text_records = [[p_text, p, self.__tokenize(p_text), 0] for (p, p_text) in enumerate(text.split("\n\n"))]
-        return pd.DataFrame.from_records(text_records, columns=['Sentence', 'Paragraph', 'Token', 'Cohesion'],
-                                         index='Paragraph')
-
-    def __tokenize(self, p_text):
-        """
-        Trasform a paragraph in a dictionary of word, freq.
-        Punctuation and stopwords are removed, and the words are lemmatized
-        :param p_text: text of the paragraph
-        :return: dict{word: freq}
-        """
-        p_text = ''.join(filter(lambda x: (str.isalpha(x) or x == " "), p_text))
-        words_token = word_tokenize(p_text)
-        pos_tag_dict = dict(pos_tag(words_token))
-        splitted_text = [lemmatize_word(w, pos_tag_dict[w]).lower() for w in words_token
-                         if w not in stopwords.words("english") if len(w) > 2]
-        return {i: splitted_text.count(i) for i in set(splitted_text)}
-
-    def __compute_cohesion(self, df_document):
-        """
-        Compute the cohesion between all paragraph
-        :param df_document: the document dataframe
-        :return: the document dataframe with the cohesion column attribute computed
-        """
-        for p, row in df_document[1:].iterrows():
-            cohesion = 0
-            for p_i, row_i in df_document[df_document.index != p].iterrows():
-                chs = self.__compute_paragraph_cohesion((p, row['Token']), (p_i, row_i['Token']))
-                cohesion += chs if p_i != 0 else p_i * 1.5  # weight more cohesion with the title
-            df_document.at[p, 'Cohesion'] = cohesion if p != 0 else cohesion * 1.5
-        return df_document
-
-    def __compute_paragraph_cohesion(self, paragraph1, paragraph2):
-        """
-        Compute the cohesion of two paragraph as the similarity between all words combinations
-        :param paragraph1: tuple (paragraph number, dict{word: freq})
-        :param paragraph2: tuple (paragraph number, dict{word: freq})
-        :return: the paragraph cohesion
-        """
-        p1, par1 = paragraph1
-        p2, par2 = paragraph2
-        key = "{};{}".format(p1, p2) if p1 < p2 else "{};{}".format(p2, p1)
-        if key in self.cached_cohesion.keys():
-            return self.cached_cohesion[key]
-        cohesion = 0
-        for w1 in par1.keys():
-            for w2 in par2.keys():
-                cohesion += self.__similarity(w1, w2) * par1[w1] * par2[w2]
-        self.cached_cohesion[key] = cohesion
-        return cohesion
-
-    @functools.lru_cache(maxsize=1024)
+            context = multiprocessing.get_context()
+        try:
+            pool = context.Pool(processes, initializer=_init_worker, initargs=(self.nasari_file_path,))
+        finally:
+            _worker_summarizer = None
+        with pool:
+            tasks = ((source, percentage, granularity) for source in paths_or_texts)
+            for result in pool.imap(_summarize_worker, tasks, chunksize):
+                yield result
+
+    @staticmethod
+    def __read_document(path_or_text):
+        """
+        Return the text of a document
+        :param path_or_text: the document filepath, or directly the text of the document
+        :return: the text
+        """
+        if os.path.isfile(path_or_text):
+            with open(path_or_text) as f:
+                return f.read()
+        return path_or_text
+
+    @staticmethod
+    def __tokenize(texts):
+        """
+        Trasform the paragraphs in dictionaries of word, freq.
+        Punctuation and stopwords are removed, and the words are lemmatized.
+        All the paragraphs are POS tagged in a single batch
+        :param texts: list of paragraph texts
+        :return: list of dict{word: freq}
+        """
+        words_tokens = [word_tokenize(letters_only(p_text)) for p_text in texts]
+        stop_words = english_stopwords()
+        token_bags = []
+        for words_token, tagged in zip(words_tokens, pos_tag_sents(words_tokens)):
+            pos_tag_dict = dict(tagged)
+            token_bags.append(dict(Counter(lemmatize_lower(w, pos_tag_dict[w]) for w in words_token
+                                           if w not in stop_words if len(w) > 2)))
+        return token_bags
+
     def __similarity(self, w1, w2):
         """
-        Compute the similarity given two word as the max word overlapse of all nasari vectors corresponding to the
-        words
+        Return the similarity of two words, from the similarity cache if already computed
         :param w1: word1
         :param w2: word2
         :return: the similarity score
         """
-        ns1 = self.__get_nasari(w1)
-        ns2 = self.__get_nasari(w2)
-        if ns1 == [] or ns2 == []:
-            return 0
-        return max([self.__word_overlapse(*ns) for ns in product(ns1, ns2)])
+        return self.similarity_cache.get_or_compute(w1, w2, self.__compute_similarity)
 
-    @functools.lru_cache()
-    def __get_nasari(self, w):
+    def __compute_similarity(self, w1, w2):
         """
-        Return the corresponding Nasari vectors given a word
-        :param w: word
-        :return: list of nasari vector
+        Compute the similarity given two word as the max word overlapse of all nasari vectors corresponding to the
+        words. Only the pairs of vectors sharing at least a feature (found with the inverted index) are compared,
+        the overlapse of the others is 0
+        :param w1: word1
+        :param w2: word2
+        :return: the similarity score
         """
-        return list(self.nasari[self.nasari['Lemma'] == w]['Features'])
+        pairs = self.nasari.overlapping_pairs(self.nasari.rows(w1), self.nasari.rows(w2))
+        return max([self.nasari.overlap(r1, r2) for r1, r2 in pairs], default=0)
 
-    @staticmethod
-    @freezeargs
-    @functools.lru_cache()
-    def __word_overlapse(v1, v2):
-        """
-        Compute the overlapse between two nasari vector
-        :param v1:
-        :param v2:
-        :return:
-        """
-        if v1 is None or v2 is None:
-            return 0
-        common_words = set(v1.keys()).intersection(set(v2.keys()))
-        wo = 0
-        for word in common_words:
-            wo += float(v1[word]) + float(v2[word])
-        return wo
+
+def _init_worker(nasari_file_path):
+    """
+    Initializer of the summarize_many worker processes, the resource is loaded only if not inherited
+    :param nasari_file_path: the nasari file path
+    :return: -
+    """
+    global _worker_summarizer
+    if _worker_summarizer is None:
+        _worker_summarizer = Summarizer(nasari_file_path)
+
+
+def _summarize_worker(task):
+    """
+    Summarize a document in a worker process (without the timing print of summarize_document, one line for each
+    document of the batch)
+    :param task: tuple (path or text, percentage, granularity)
+    :return: SummaryResult
+    """
+    source, percentage, granularity = task
+    try:
+        summary = _worker_summarizer.rank_document(source).summary(percentage, granularity)
+        return SummaryResult(source, summary, None)
+    except Exception:
+        return SummaryResult(source, None, traceback.format_exc())
+
+
+def select_segments(cohesion, percentage):
+    """
+    Select the title and the given percentage of the other segments with the highest cohesion,
+    in the original order of the text
+    :param cohesion: the cohesion of each segment (the title first)
+    :param percentage: the percentage of relevant information to keep
+    :return: list of the selected segment indexes
+    """
+    cohesion = np.asarray(cohesion)[1:]
+    selected = np.sort(np.argsort(-cohesion, kind='stable')[:int(len(cohesion) * percentage)] + 1)
+    return [0] + selected.tolist()
+
+
+def join_segments(segments, granularity):
+    """
+    Realise the summary from the selected segments
+    :param segments: the texts of the selected segments (the title first)
+    :param granularity: the granularity of the analysis (paragraph or sentence)
+    :return: a string containing the summary
+    """
+    if granularity == Granularity.PARAGRAPH:
+        return "\n\n".join(segments)
+    return "{}\n\n".format(segments[0]) + "\n".join(segments[1:])
+
+
+def iter_paragraphs(lines):
+    """
+    Split a stream of lines (with their line terminator, as read from a file) in paragraphs separated by an empty
+    line, as done by summarize_document on the whole text: comments are removed and the text is stripped.
+    A paragraph is yielded as soon as the following one starts
+    :param lines: iterable of lines
+    :return: generator of paragraphs
+    """
+    buffer, pending, blank = "", None, []
+    for line in lines:
+        buffer += re.sub("#(.*)\n", "", line)  # remove comments
+        if pending is None:
+            buffer = buffer.lstrip()
+        *paragraphs, buffer = buffer.split("\n\n")
+        for paragraph in paragraphs:
+            if not paragraph.strip():
+                blank.append(paragraph)
+                continue
+            if pending is not None:
+                yield pending
+                yield from blank
+            pending, blank = paragraph, []
+    if buffer.strip():
+        if pending is not None:
+            yield pending
+            yield from blank
+        yield buffer.rstrip()
+    elif pending is not None:
+        yield pending.rstrip()
+
+
+def letters_only(text):
+    """
+    Remove from a text everything but letters and spaces
+    :param text: the text
+    :return: the filtered text
+    """
+    text = NON_ALPHA_REGEX.sub("", text)
+    if not text.replace(" ", "").isalpha():  # rare non-decimal numerics (e.g. superscripts) kept by the regex
+        text = ''.join(c for c in text if c.isalpha() or c == " ")
+    return text
+
+
+@functools.lru_cache(maxsize=None)
+def english_stopwords():
+    """
+    :return: the set of the english stopwords, built once
+    """
+    return frozenset(stopwords.words("english"))
+
+
+@functools.lru_cache(maxsize=200000)
+def lemmatize_lower(word, treebank_tag):
+    """
+    Memoized lowercase lemma of a word
+    :param word: the word
+    :param treebank_tag: the PennTreebank POS tag
+    :return: the lemma
+    """
+    return lemmatize_word(word, treebank_tag).lower()
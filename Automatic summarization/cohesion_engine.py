@@ -0,0 +1,162 @@
+from collections import deque
+
+import numpy as np
+from scipy import sparse
+
+from data.utility.metrics import timed_stage
+
+
+class CohesionEngine:
+    """
+    Vectorized computation of the cohesion of the paragraphs of a document.
+    Given F, the paragraph x vocabulary frequency matrix, and S, the vocabulary x vocabulary similarity matrix,
+    the cohesion between two paragraphs p and q is F[p] S F[q]^T, so the cohesion of all the pairs is F S F^T
+    """
+
+    def __init__(self, similarity, related_words=None, metrics=None):
+        """
+        :param similarity: function (w1, w2) -> similarity score of two words
+        :param related_words: optional function w -> set of the words that can have a nonzero similarity with w,
+        used to prune the pairs of the similarity matrix (all the pairs are scored if missing)
+        :param metrics: optional StageMetrics, the time spent building the similarity matrix is recorded as
+        the 'similarity' stage
+        """
+        self.similarity = similarity
+        self.related_words = related_words
+        self.metrics = metrics
+
+    @staticmethod
+    def frequency_matrix(token_bags):
+        """
+        Build the paragraph x vocabulary frequency matrix
+        :param token_bags: list of dict{word: freq}, one for each paragraph
+        :return: (vocabulary list, sparse matrix)
+        """
+        vocabulary, rows, cols, freqs = {}, [], [], []
+        for p, bag in enumerate(token_bags):
+            for word, freq in bag.items():
+                rows.append(p)
+                cols.append(vocabulary.setdefault(word, len(vocabulary)))
+                freqs.append(freq)
+        matrix = sparse.csr_matrix((np.array(freqs, dtype=np.float64), (rows, cols)),
+                                   shape=(len(token_bags), len(vocabulary)))
+        return list(vocabulary), matrix
+
+    def similarity_matrix(self, vocabulary):
+        """
+        Build the (symmetric) vocabulary x vocabulary similarity matrix
+        :param vocabulary: list of words
+        :return: sparse matrix
+        """
+        rows, cols, values = [], [], []
+        positions = {w: i for i, w in enumerate(vocabulary)}
+        for i, w1 in enumerate(vocabulary):
+            if self.related_words is not None:
+                candidates = sorted(j for j in map(positions.get, self.related_words(w1)) if j is not None and j >= i)
+            else:
+                candidates = range(i, len(vocabulary))
+            for j in candidates:
+                sim = self.similarity(w1, vocabulary[j])
+                if sim:
+                    rows.append(i)
+                    cols.append(j)
+                    values.append(sim)
+        upper = sparse.csr_matrix((np.array(values, dtype=np.float64), (rows, cols)),
+                                  shape=(len(vocabulary), len(vocabulary)))
+        return upper + sparse.triu(upper, k=1).T
+
+    def cohesion(self, token_bags):
+        """
+        Compute the cohesion of each paragraph as the sum of its cohesion with all the other paragraphs.
+        As in the original pairwise loop the title (paragraph 0) is not ranked and its column is weighted
+        p_i * 1.5 = 0, so the cohesion with the title does not change the ranking
+        :param token_bags: list of dict{word: freq}, one for each paragraph (the title first)
+        :return: numpy array, the cohesion of each paragraph
+        """
+        vocabulary, frequencies = self.frequency_matrix(token_bags)
+        with timed_stage(self.metrics, "similarity"):
+            similarity = self.similarity_matrix(vocabulary)
+        paragraph_cohesion = (frequencies @ similarity @ frequencies.T).toarray()
+        weights = np.ones(len(token_bags))
+        weights[0] = 0
+        cohesion = paragraph_cohesion @ weights - paragraph_cohesion.diagonal() * weights
+        cohesion[0] = 0
+        return cohesion
+
+    def pair_cohesion(self, bag1, bag2):
+        """
+        Compute the cohesion between two paragraphs as the similarity between all words combinations
+        (multiplied by the frequencies), visiting only the related words if the engine can prune them
+        :param bag1: dict{word: freq} of the first paragraph
+        :param bag2: dict{word: freq} of the second paragraph
+        :return: the paragraph cohesion
+        """
+        cohesion = 0
+        for w1, freq1 in bag1.items():
+            candidates = bag2.keys() if self.related_words is None else bag2.keys() & self.related_words(w1)
+            for w2 in candidates:
+                cohesion += self.similarity(w1, w2) * freq1 * bag2[w2]
+        return cohesion
+
+
+class StreamingCohesion:
+    """
+    Incremental cohesion of a stream of paragraphs, the paragraph x paragraph matrix is never built.
+    Without a window the cohesion is the same of CohesionEngine.cohesion: since S is symmetric,
+    cohesion[p] = F[p] S (T - F[p]) where T is the sum of the frequencies of all the paragraphs (but the title),
+    so only the running vocabulary totals T and the compact token bags are kept, and S T is computed once at the end.
+    With a window of k paragraphs the cohesion of each paragraph is computed only with its k previous and k following
+    paragraphs, the totals are updated when a paragraph arrives and only the last k token bags are kept
+    """
+
+    def __init__(self, engine, window=None):
+        """
+        :param engine: the CohesionEngine providing the word similarities
+        :param window: number of neighbour paragraphs (on each side) used for the cohesion, all if None
+        """
+        self.engine = engine
+        self.window = window
+        self.cohesion = []
+        self.__vocabulary = {}
+        self.__totals = []
+        self.__bags = []
+        self.__recent = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self.cohesion)
+
+    def add(self, token_bag):
+        """
+        Add the next paragraph of the stream (the first one is the title)
+        :param token_bag: dict{word: freq} of the paragraph
+        :return: -
+        """
+        p = len(self.cohesion)
+        self.cohesion.append(0)
+        if p == 0:
+            return
+        if self.window is None:
+            ids = [self.__vocabulary.setdefault(word, len(self.__vocabulary)) for word in token_bag]
+            self.__totals.extend([0] * (len(self.__vocabulary) - len(self.__totals)))
+            for i, freq in zip(ids, token_bag.values()):
+                self.__totals[i] += freq
+            self.__bags.append((np.array(ids, dtype=np.int64), np.array(list(token_bag.values()), dtype=np.float64)))
+            self.cohesion[p] = -self.engine.pair_cohesion(token_bag, token_bag)
+        else:
+            for q, bag_q in self.__recent:
+                chs = self.engine.pair_cohesion(token_bag, bag_q)
+                self.cohesion[p] += chs
+                self.cohesion[q] += chs
+            self.__recent.append((p, token_bag))
+
+    def scores(self):
+        """
+        :return: numpy array, the cohesion of each paragraph received so far (0 for the title)
+        """
+        cohesion = np.array(self.cohesion, dtype=np.float64)
+        if self.window is None and self.__bags:
+            vocabulary = list(self.__vocabulary)
+            weighted_totals = self.engine.similarity_matrix(vocabulary) @ np.array(self.__totals, dtype=np.float64)
+            for p, (ids, freqs) in enumerate(self.__bags, start=1):
+                cohesion[p] += freqs @ weighted_totals[ids]
+        return cohesion
@@ -0,0 +1,106 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed, roughly logarithmic buckets (upper bounds in milliseconds)
+    """
+    BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0
+        self.max_ms = 0
+
+    def observe(self, latency_ms):
+        """
+        Record a latency
+        :param latency_ms: the latency in milliseconds
+        :return: -
+        """
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket containing it
+        :param q: the quantile, in [0, 1]
+        :return: the latency in milliseconds
+        """
+        if self.count == 0:
+            return 0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        """
+        :return: dict with count, mean, p50, p90, p99, max and the bucket counts
+        """
+        return {"count": self.count,
+                "mean_ms": self.total_ms / self.count if self.count else 0,
+                "p50_ms": self.quantile(0.5),
+                "p90_ms": self.quantile(0.9),
+                "p99_ms": self.quantile(0.99),
+                "max_ms": self.max_ms,
+                "buckets": {str(bound): count for bound, count in zip(self.BUCKETS_MS, self.counts) if count}}
+
+
+class StageMetrics:
+    """
+    Thread-safe latency histograms of the named stages of a computation
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, name, latency_ms):
+        """
+        Record the latency of a stage
+        :param name: the stage name
+        :param latency_ms: the latency in milliseconds
+        :return: -
+        """
+        with self.__lock:
+            if name not in self.histograms:
+                self.histograms[name] = LatencyHistogram()
+            self.histograms[name].observe(latency_ms)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager measuring the wall time of a stage
+        :param name: the stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        """
+        :return: dict{stage: histogram snapshot}
+        """
+        with self.__lock:
+            return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+
+def timed_stage(metrics, name):
+    """
+    Measure a stage if the metrics are enabled
+    :param metrics: StageMetrics or None
+    :param name: the stage name
+    :return: a context manager
+    """
+    return metrics.stage(name) if metrics is not None else nullcontext()
@@ -0,0 +1,167 @@
+import numpy as np
+
+from data.utility.nasari_binary import parse_lexical_nasari, read_nasari_binary, write_nasari_binary, \
+    is_nasari_binary, build_inverted_index, LEXICAL
+from data.utility.utility import build_nasari_index
+
+
+class NasariVectors:
+    """
+    Lexical nasari vectors kept in CSR form: the features of the sense in row i are the sorted
+    feature_ids[indptr[i]:indptr[i + 1]] (ids in the features vocabulary) with the parallel float32 weights.
+    The inverted index (feature -> senses containing it) is kept in the same form:
+    feature_rows[feature_indptr[f]:feature_indptr[f + 1]]. Both are stored in the compiled files, so loading
+    one only maps the arrays
+    """
+
+    def __init__(self, synsets, lemmas, features, indptr, feature_ids, weights, feature_indptr=None,
+                 feature_rows=None):
+        self.synsets = synsets
+        self.lemmas = [lemma.lower() for lemma in lemmas]
+        self.features = features
+        self.indptr = indptr
+        if feature_indptr is None or feature_rows is None:
+            # files compiled without the inverted index can have unsorted rows
+            feature_ids, weights = self.__sorted_rows(indptr, feature_ids, weights)
+            feature_indptr, feature_rows = build_inverted_index(indptr, feature_ids, len(features))
+        self.feature_ids, self.weights = feature_ids, weights
+        self.feature_indptr, self.feature_rows = feature_indptr, feature_rows
+        self.lemma_index = build_nasari_index(self.lemmas)
+        self.__neighbours = {}
+        self.__related_lemmas = {}
+
+    @staticmethod
+    def __sorted_rows(indptr, feature_ids, weights):
+        """
+        Sort the feature ids (and the weights) inside each row, the arrays are copied only if they are not sorted
+        :return: (feature_ids, weights)
+        """
+        entry_rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        if np.all((np.diff(feature_ids) > 0) | (np.diff(entry_rows) != 0)):
+            return feature_ids, weights
+        order = np.lexsort((feature_ids, entry_rows))
+        return feature_ids[order], weights[order]
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Load the nasari vectors, from a compiled binary file (memory mapped) or from the text release
+        :param file_path: the nasari file path
+        :return: NasariVectors
+        """
+        if is_nasari_binary(file_path):
+            return cls.from_binary(file_path)
+        return cls.from_text(file_path)
+
+    @classmethod
+    def from_text(cls, file_path):
+        """
+        Parse the text nasari file (BabelSyn;Lemma;feature_weight;...)
+        :param file_path: the nasari file path
+        :return: NasariVectors
+        """
+        with open(file_path) as f:
+            arrays, strings = parse_lexical_nasari(f)
+        return cls(strings['synsets'], strings['lemmas'], strings['features'], **arrays)
+
+    @classmethod
+    def from_binary(cls, file_path):
+        """
+        Memory map a nasari file compiled with nasari_binary.py
+        :param file_path: the compiled file path
+        :return: NasariVectors
+        """
+        nasari = read_nasari_binary(file_path)
+        if nasari.kind != LEXICAL:
+            raise ValueError("{} does not contain lexical nasari vectors".format(file_path))
+        return cls(nasari.strings['synsets'], nasari.strings['lemmas'], nasari.strings['features'], **nasari.arrays)
+
+    def save(self, file_path):
+        """
+        Write the vectors in the compiled binary format
+        :param file_path: output path
+        :return: -
+        """
+        write_nasari_binary(file_path, LEXICAL,
+                            {'indptr': self.indptr, 'feature_ids': self.feature_ids, 'weights': self.weights,
+                             'feature_indptr': self.feature_indptr, 'feature_rows': self.feature_rows},
+                            {'synsets': self.synsets, 'lemmas': self.lemmas, 'features': self.features})
+
+    def __len__(self):
+        return len(self.synsets)
+
+    def vector(self, row):
+        """
+        Return the nasari vector of a sense
+        :param row: the sense row
+        :return: dict{feature: weight}
+        """
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return {self.features[f]: float(w) for f, w in zip(self.feature_ids[start:end], self.weights[start:end])}
+
+    def rows(self, lemma):
+        """
+        Return the rows of the senses of a lemma
+        :param lemma: the (lowercase) lemma
+        :return: tuple of rows
+        """
+        return self.lemma_index.get(lemma, ())
+
+    def overlap(self, row1, row2):
+        """
+        Compute the word overlap between two senses, as the sum of the weights of the common features.
+        The features are found with a merge-intersection of the sorted feature ids
+        :param row1: first sense row
+        :param row2: second sense row
+        :return: the overlap
+        """
+        start1, end1 = self.indptr[row1], self.indptr[row1 + 1]
+        start2, end2 = self.indptr[row2], self.indptr[row2 + 1]
+        _, common1, common2 = np.intersect1d(self.feature_ids[start1:end1], self.feature_ids[start2:end2],
+                                             assume_unique=True, return_indices=True)
+        return float(self.weights[start1:end1][common1].sum(dtype=np.float64) +
+                     self.weights[start2:end2][common2].sum(dtype=np.float64))
+
+    def overlapping_rows(self, rows):
+        """
+        Return the senses sharing at least one feature with any of the given senses
+        :param rows: iterable of sense rows
+        :return: sorted numpy array of rows
+        """
+        features = [self.feature_ids[self.indptr[r]:self.indptr[r + 1]] for r in rows]
+        if not features:
+            return np.empty(0, dtype=np.int32)
+        postings = [self.feature_rows[self.feature_indptr[f]:self.feature_indptr[f + 1]]
+                    for f in np.unique(np.concatenate(features))]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings))
+
+    def overlapping_pairs(self, rows1, rows2):
+        """
+        Return the pairs of senses (one from each list) that share at least one feature,
+        the other pairs have a zero overlap
+        :param rows1: first list of sense rows
+        :param rows2: second list of sense rows
+        :return: list of (row1, row2)
+        """
+        pairs = []
+        for r1 in rows1:
+            neighbours = self.__neighbours.get(r1)
+            if neighbours is None:
+                neighbours = self.__neighbours[r1] = frozenset(self.overlapping_rows((r1,)).tolist())
+            pairs += [(r1, r2) for r2 in rows2 if r2 in neighbours]
+        return pairs
+
+    def related_lemmas(self, lemma):
+        """
+        Return all the lemmas with at least one sense sharing a feature with a sense of the given lemma
+        (i.e. the lemmas that can have a nonzero overlap with it), memoized for each lemma
+        :param lemma: the (lowercase) lemma
+        :return: frozenset of lemmas
+        """
+        related = self.__related_lemmas.get(lemma)
+        if related is None:
+            related = self.__related_lemmas[lemma] = frozenset(
+                self.lemmas[r] for r in self.overlapping_rows(self.rows(lemma)))
+        return related
@@ -0,0 +1,188 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict, defaultdict
+
+
+class SimilarityCache:
+    """
+    Size-bounded cache of word similarities, keyed by the sorted word pair (the similarity is symmetric).
+    The eviction policy is LRU (least recently used) or LFU (least frequently used, ties broken by recency),
+    the hits and misses are counted and the content can be persisted on disk to be reused across runs.
+    The cache can be shared by different threads
+    """
+    LRU = "lru"
+    LFU = "lfu"
+
+    def __init__(self, max_size=200000, policy=LRU, file_path=None):
+        """
+        :param max_size: max number of word pairs kept in the cache
+        :param policy: SimilarityCache.LRU or SimilarityCache.LFU
+        :param file_path: optional file where the cache is persisted, loaded if it exists
+        """
+        if policy not in (self.LRU, self.LFU):
+            raise ValueError("Unknown eviction policy {}".format(policy))
+        self.max_size = max_size
+        self.policy = policy
+        self.file_path = file_path
+        self.hits = 0
+        self.misses = 0
+        self.__values = {}
+        self.__recency = OrderedDict()
+        self.__counts = {}
+        self.__buckets = defaultdict(OrderedDict)
+        self.__min_count = 0
+        self.__lock = threading.RLock()
+        if file_path is not None and os.path.exists(file_path):
+            self.load(file_path)
+
+    @staticmethod
+    def key(w1, w2):
+        """
+        :return: the cache key of a word pair
+        """
+        return (w1, w2) if w1 <= w2 else (w2, w1)
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __contains__(self, pair):
+        return self.key(*pair) in self.__values
+
+    def stats(self):
+        """
+        :return: dict with size, hits, misses and hit rate of the cache
+        """
+        return {"size": len(self), "max_size": self.max_size, "policy": self.policy,
+                "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def get(self, w1, w2, default=None):
+        """
+        Return the cached similarity of a word pair
+        :param w1: word1
+        :param w2: word2
+        :param default: value returned if the pair is not cached
+        :return: the similarity
+        """
+        key = self.key(w1, w2)
+        with self.__lock:
+            if key not in self.__values:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.__touch(key)
+            return self.__values[key]
+
+    def put(self, w1, w2, value):
+        """
+        Cache the similarity of a word pair, evicting an entry if the cache is full
+        :param w1: word1
+        :param w2: word2
+        :param value: the similarity
+        :return: -
+        """
+        with self.__lock:
+            self.__insert(self.key(w1, w2), value, 1)
+
+    def get_or_compute(self, w1, w2, compute):
+        """
+        Return the cached similarity of a word pair, computing and caching it if missing
+        :param w1: word1
+        :param w2: word2
+        :param compute: function (w1, w2) -> similarity
+        :return: the similarity
+        """
+        value = self.get(w1, w2)
+        if value is None:
+            value = compute(w1, w2)
+            self.put(w1, w2, value)
+        return value
+
+    def clear(self):
+        """
+        Remove all the entries and reset the counters
+        :return: -
+        """
+        with self.__lock:
+            self.__values.clear()
+            self.__recency.clear()
+            self.__counts.clear()
+            self.__buckets.clear()
+            self.__min_count = 0
+            self.hits = self.misses = 0
+
+    def save(self, file_path=None):
+        """
+        Persist the cache on disk (from the least to the most recently used entry)
+        :param file_path: output path, the one given at construction time if missing
+        :return: -
+        """
+        file_path = file_path or self.file_path
+        with self.__lock:
+            entries = [(key, self.__values[key], self.__counts.get(key, 1)) for key in self.__ordered_keys()]
+        with open(file_path, "wb") as f:
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, file_path):
+        """
+        Load the entries persisted with save
+        :param file_path: the cache file
+        :return: -
+        """
+        with open(file_path, "rb") as f:
+            entries = pickle.load(f)
+        with self.__lock:
+            for key, value, count in entries:
+                self.__insert(tuple(key), value, count)
+
+    def __ordered_keys(self):
+        if self.policy == self.LRU:
+            return list(self.__recency)
+        return [key for count in sorted(self.__buckets) for key in self.__buckets[count]]
+
+    def __touch(self, key):
+        if self.policy == self.LRU:
+            self.__recency.move_to_end(key)
+            return
+        count = self.__counts[key]
+        del self.__buckets[count][key]
+        if not self.__buckets[count]:
+            del self.__buckets[count]
+            if self.__min_count == count:
+                self.__min_count = count + 1
+        self.__counts[key] = count + 1
+        self.__buckets[count + 1][key] = None
+
+    def __insert(self, key, value, count):
+        if key in self.__values:
+            self.__values[key] = value
+            self.__touch(key)
+            return
+        if self.max_size <= 0:
+            return
+        if len(self.__values) >= self.max_size:
+            self.__evict()
+        self.__values[key] = value
+        if self.policy == self.LRU:
+            self.__recency[key] = None
+        else:
+            self.__counts[key] = count
+            self.__buckets[count][key] = None
+            self.__min_count = count if len(self.__values) == 1 else min(self.__min_count, count)
+
+    def __evict(self):
+        if self.policy == self.LRU:
+            key, _ = self.__recency.popitem(last=False)
+        else:
+            bucket = self.__buckets[self.__min_count]
+            key, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self.__buckets[self.__min_count]
+                self.__min_count = min(self.__buckets) if self.__buckets else 0
+            del self.__counts[key]
+        del self.__values[key]
@@ -1,8 +1,5 @@
-import functools
 import time
 
-from pydot import frozendict
-
 
 def timeit(method):
     """
@@ -23,15 +20,14 @@ def timeit(method):
     return timed
 
 
-def freezeargs(func):
-    """Transform mutable dictionnary
-    Into immutable
-    Useful to be compatible with cache
+def build_nasari_index(keys):
     """
-
-    @functools.wraps(func)
-    def wrapped(*args, **kwargs):
-        args = tuple([frozendict(arg) if isinstance(arg, dict) else arg for arg in args])
-        kwargs = {k: frozendict(v) if isinstance(v, dict) else v for k, v in kwargs.items()}
-        return func(*args, **kwargs)
-    return wrapped
+    Build a hash index over a column of the nasari resource, so that the rows of a key
+    are found in O(1) instead of scanning the whole column
+    :param keys: iterable of keys (e.g. the Lemma column), in row order
+    :return: dict{key: tuple of row positions}
+    """
+    index = {}
+    for position, key in enumerate(keys):
+        index.setdefault(key, []).append(position)
+    return {key: tuple(positions) for key, positions in index.items()}
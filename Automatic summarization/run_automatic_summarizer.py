@@ -1,18 +1,22 @@
 import os
 
 from automatic_summarizer import Summarizer, Granularity
+from data.utility.similarity_cache import SimilarityCache
 
 NASARI_PATH = "./data/nasari_small.txt"
+SIMILARITY_CACHE_PATH = "./data/similarity_cache.pkl"
 OUTPUT_FOLDER = "./data/summary"
 DOCUMENTS = ["./data/sample/Donald-Trump-vs-Barack-Obama-on-Nuclear-Weapons-in-East-Asia.txt",
              "./data/sample/People-Arent-Upgrading-Smartphones-as-Quickly-and-That-Is-Bad-for-Apple.txt",
              "./data/sample/The-Last-Man-on-the-Moon--Eugene-Cernan-gives-a-compelling-account.txt"]
 
-summarizer = Summarizer(nasari_file_path=NASARI_PATH)
+summarizer = Summarizer(nasari_file_path=NASARI_PATH,
+                        similarity_cache=SimilarityCache(file_path=SIMILARITY_CACHE_PATH))
 for document in DOCUMENTS:
-    sm = summarizer.summarize_document(document, percentage=0.5)
+    ranked_document = summarizer.rank_document(document)
+    sm = ranked_document.summary(percentage=0.5)
     print(sm, file=open(os.path.join(OUTPUT_FOLDER, os.path.basename(document)), 'w'))
-
-for document in DOCUMENTS:
-    sm = summarizer.summarize_document(document, percentage=0.3, granularity=Granularity.SENTENCE)
+    sm = ranked_document.summary(percentage=0.3, granularity=Granularity.SENTENCE)
     print(sm, file=open(os.path.join(OUTPUT_FOLDER, "sentence", os.path.basename(document)), 'w'))
+
+summarizer.similarity_cache.save()
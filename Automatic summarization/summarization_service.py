@@ -0,0 +1,235 @@
+"""
+Long-running summarization service.
+
+The Summarizer (nasari resource, NLTK models, similarity cache) is loaded and warmed up once, then the documents are
+summarized by a bounded pool of worker threads. Requests beyond the capacity of the queue are rejected with 503,
+so the latency of the accepted ones stays predictable.
+
+    POST /summarize   {"text": "...", "percentage": 0.3, "granularity": "sentence"}  (the text is never read as a path)
+    GET  /metrics     per-stage latency histograms, similarity cache hit rate, queue state
+    GET  /health
+
+Usage:
+    python summarization_service.py --nasari ./data/nasari_small.nbin --port 8080 --workers 4 --max-queue 32
+"""
+
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from automatic_summarizer import Summarizer, Granularity
+from data.utility.metrics import StageMetrics
+from data.utility.similarity_cache import SimilarityCache
+
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+WARM_UP_DOCUMENT = "Warm up\n\nThe summarizer loads the language models.\n\nThe service is ready to summarize documents."
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class SummarizationService:
+    """
+    Summarize documents with a warm Summarizer and a bounded work queue
+    """
+
+    def __init__(self, summarizer, workers=4, max_queue=32):
+        """
+        :param summarizer: the Summarizer (its metrics are created if missing)
+        :param workers: number of worker threads
+        :param max_queue: max number of requests waiting for a worker, the following ones are rejected
+        """
+        if summarizer.metrics is None:
+            summarizer.metrics = summarizer.cohesion_engine.metrics = StageMetrics()
+        self.summarizer = summarizer
+        self.metrics = summarizer.metrics
+        self.capacity = workers + max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarizer")
+        self.rejected = 0
+        self.failed = 0
+        self.__slots = threading.BoundedSemaphore(self.capacity)
+        self.__in_flight = 0
+        self.__lock = threading.Lock()
+
+    def warm_up(self):
+        """
+        Summarize a small document, so that the lazy NLTK resources are loaded before the first request
+        :return: -
+        """
+        self.summarizer.rank_text(WARM_UP_DOCUMENT).summary(granularity=Granularity.SENTENCE)
+
+    def submit(self, text, percentage=0.7, granularity=Granularity.PARAGRAPH):
+        """
+        Queue a document to be summarized
+        :param text: the document text (never read as a file path)
+        :param percentage: the percentage of relevant information to keep
+        :param granularity: the granularity of the analysis (paragraph or sentence)
+        :return: a Future with the summary
+        :raise QueueFullError: if the queue is full
+        """
+        if not self.__slots.acquire(blocking=False):
+            with self.__lock:
+                self.rejected += 1
+            raise QueueFullError("The summarization queue is full")
+        with self.__lock:
+            self.__in_flight += 1
+        try:
+            return self.executor.submit(self.__summarize, text, percentage, granularity)
+        except Exception:
+            self.__release()
+            raise
+
+    def summarize(self, text, percentage=0.7, granularity=Granularity.PARAGRAPH, timeout=None):
+        """
+        Summarize a document, waiting for the result
+        :param timeout: max seconds to wait for the summary
+        :return: the summary
+        """
+        return self.submit(text, percentage, granularity).result(timeout)
+
+    def stats(self):
+        """
+        :return: dict with the stage latencies, the similarity cache stats and the queue state
+        """
+        with self.__lock:
+            queue = {"in_flight": self.__in_flight, "capacity": self.capacity,
+                     "rejected": self.rejected, "failed": self.failed}
+        return {"stages": self.metrics.snapshot(), "similarity_cache": self.summarizer.similarity_cache.stats(),
+                "queue": queue}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def __summarize(self, text, percentage, granularity):
+        try:
+            with self.metrics.stage("request"):
+                return self.summarizer.rank_text(text).summary(percentage, granularity)
+        except Exception:
+            with self.__lock:
+                self.failed += 1
+            raise
+        finally:
+            self.__release()
+
+    def __release(self):
+        with self.__lock:
+            self.__in_flight -= 1
+        self.__slots.release()
+
+
+class SummarizationRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP interface of a SummarizationService (set as the service attribute of the server)
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.__reply(200, self.server.service.stats())
+        elif self.path == "/health":
+            self.__reply(200, {"status": "ok"})
+        else:
+            self.__reply(404, {"error": "Unknown path {}".format(self.path)})
+
+    def do_POST(self):
+        if self.path != "/summarize":
+            self.__reply(404, {"error": "Unknown path {}".format(self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= self.server.max_request_bytes:
+            self.close_connection = True
+            self.__reply(413 if length > 0 else 400,
+                         {"error": "Content-Length must be between 0 and {}".format(self.server.max_request_bytes)})
+            return
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf8"))
+            text = request["text"]
+            if not isinstance(text, str):
+                raise TypeError("text must be a string")
+            percentage = float(request.get("percentage", 0.7))
+            if not 0 <= percentage <= 1:
+                raise ValueError("percentage must be between 0 and 1")
+            granularity = Granularity[request.get("granularity", "paragraph").upper()]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.__reply(400, {"error": "Invalid request: {}".format(e)})
+            return
+        try:
+            future = self.server.service.submit(text, percentage, granularity)
+        except QueueFullError as e:
+            self.__reply(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        try:
+            summary = future.result(self.server.request_timeout)
+        except TimeoutError:
+            self.__reply(504, {"error": "The summarization did not complete in time"})
+        except Exception as e:
+            self.__reply(500, {"error": repr(e)})
+        else:
+            self.__reply(200, {"summary": summary})
+
+    def log_message(self, format, *args):
+        pass
+
+    def __reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def create_server(service, host="127.0.0.1", port=8080, request_timeout=60, max_request_bytes=MAX_REQUEST_BYTES):
+    """
+    Create the HTTP server of a SummarizationService
+    :param service: the SummarizationService
+    :param host: the host to bind
+    :param port: the port to bind (0 for a free port)
+    :param request_timeout: max seconds a request waits for its summary
+    :param max_request_bytes: max size of a request body, the larger ones are rejected with 413
+    :return: ThreadingHTTPServer
+    """
+    server = ThreadingHTTPServer((host, port), SummarizationRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.request_timeout = request_timeout
+    server.max_request_bytes = max_request_bytes
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarization HTTP service")
+    parser.add_argument("--nasari", default="./data/nasari_small.txt", help="nasari text or compiled file")
+    parser.add_argument("--similarity-cache", default=None, help="file where the similarity cache is persisted")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--max-request-bytes", type=int, default=MAX_REQUEST_BYTES)
+    args = parser.parse_args()
+
+    summarization_service = SummarizationService(
+        Summarizer(args.nasari, SimilarityCache(file_path=args.similarity_cache), StageMetrics()),
+        workers=args.workers, max_queue=args.max_queue)
+    summarization_service.warm_up()
+    http_server = create_server(summarization_service, args.host, args.port, args.request_timeout,
+                                args.max_request_bytes)
+    print("Summarization service listening on {}:{}".format(args.host, http_server.server_port))
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        summarization_service.shutdown()
+        if args.similarity_cache is not None:
+            summarization_service.summarizer.similarity_cache.save()
@@ -1,6 +1,8 @@
 import csv
+import functools
 import itertools
 import math
+import os
 import matplotlib.pyplot as plt
 import nltk
 import numpy as np
@@ -11,6 +13,20 @@ from scipy.stats.stats import spearmanr
 from sklearn.preprocessing import StandardScaler
 from sklearn.preprocessing import minmax_scale
 
+from depth_table import DepthTable
+from taxonomy_index import TaxonomyIndex
+
+DEPTH_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "max_depth_table.json")
+
+
+@functools.lru_cache(maxsize=None)
+def taxonomy_index():
+    """
+    Lazily build the first hypernym taxonomy of Wordnet, with the precomputed depths and ancestors
+    :return: TaxonomyIndex
+    """
+    return TaxonomyIndex.from_wordnet(wn)
+
 
 def depth(sense):
     """
@@ -18,11 +34,8 @@ def depth(sense):
     :param sense: synset for calculate depth
     :return: integere representing the depth of the synset
     """
-    if (sense is not None):
-        ancestor = sense.hypernyms()
-        if len(ancestor) > 0:
-            return 1 + depth(ancestor[0])
-    return 0
+    index = taxonomy_index()
+    return index.depth(index.row(sense))
 
 
 def lcs_path(sense_1, sense_2, path):
@@ -33,36 +46,10 @@ def lcs_path(sense_1, sense_2, path):
     :param path: path between the two synset
     :return: (least common subsumer (synset), path between senses (integer))
     """
-    s1_depth = depth(sense_1)
-    s2_depth = depth(sense_2)
-    if (s1_depth == s2_depth):
-        return lcs_path_same_depth(sense_1, sense_2, path)
-    elif (s1_depth < s2_depth):
-        ancestor_2 = sense_2.hypernyms()
-        if len(ancestor_2) > 0:
-            return lcs_path(sense_1, ancestor_2[0], path + 1)
-    else:
-        ancestor_1 = sense_1.hypernyms()
-        if len(ancestor_1) > 0:
-            return lcs_path(ancestor_1[0], sense_2, path + 1)
-
-
-def lcs_path_same_depth(sense_1, sense_2, path):
-    """
-    Helper function to compute the least common subsumer
-    of two synset at the same depth and their shortest path
-    :param sense_1: first synset
-    :param sense_2: second synset
-    :param path: path between the two synset
-    :return: (least common subsumer (synset), path between senses (integer))
-    """
-    ancestor_1 = sense_1.hypernyms()
-    ancestor_2 = sense_2.hypernyms()
-    if (len(ancestor_1) > 0 and len(ancestor_2) > 0):
-        if (ancestor_1[0] == ancestor_2[0]):
-            return ancestor_1[0], path + 2
-        else:
-            return lcs_path_same_depth(ancestor_1[0], ancestor_2[0], path + 2)
+    index = taxonomy_index()
+    lcs_tuple = index.lcs_path(index.row(sense_1), index.row(sense_2))
+    if lcs_tuple is not None:
+        return index.synsets[lcs_tuple[0]], path + lcs_tuple[1]
 
 
 def wu_palmer_similarity(sense_1, sense_2, lcs):
@@ -100,28 +87,36 @@ def lc_similarity(sense_1, sense_2, senses_path, depth_max):
     return (-(math.log2((((senses_path) + 1) / ((2 * depth_max) + 1)))))
 
 
-def get_all_synset_list(list):
+def get_all_synset_list(words):
     """
     Helper function to transform a list of words into a list of synsets
-    :param list: the list to transform
+    :param words: the list to transform
     :return: a list of synset
     """
-    syns_list = []
-    for elem in list:
-        syns_list.append(wn.synsets(elem[0]))
-        syns_list.append(wn.synsets(elem[1]))
-    return itertools.chain.from_iterable(syns_list)
+    return itertools.chain.from_iterable(wn.synsets(word) for word in words)
+
+
+@functools.lru_cache(maxsize=None)
+def depth_table():
+    """
+    Lazily load the persisted table of the max hypernym path lengths
+    :return: DepthTable
+    """
+    return DepthTable(DEPTH_TABLE_PATH)
 
 
 def max_dataset_depth(df):
     """
-    Compute the max depth of the dataset taxonomy in Wordnet
+    Compute the max depth of the dataset taxonomy in Wordnet, as the longest hypernym path of the synsets
+    of the dataset words. The lengths are memoized in the depth table, which is saved if new words were added
     :param df: a dataframe containing the dataset
     :return: number representing the max depth of the taxonomy
     """
-    df_to_list = df.reset_index()[['Word 1', 'Word 2']].values.astype(str).tolist()
-    all_synset_list = get_all_synset_list(list(itertools.chain.from_iterable(df_to_list)))
-    return max(max(len(hyp_path) for hyp_path in ss.hypernym_paths()) for ss in all_synset_list)
+    table = depth_table()
+    depth_max = table.max_depth(df[['Word 1', 'Word 2']].values.astype(str).ravel().tolist(), wn)
+    if table.modified:
+        table.save()
+    return depth_max
 
 
 def print_correlations(human_similarity, wup_term_sim, shp_term_sim, lch_term_sim):
@@ -164,38 +159,111 @@ def compute_max_term_similarity(df):
     :param df: dataframe containing the dataset
     :return: three lists containing the max similarity and the human similarity list
     """
-    human_similarity, wup_term_sim, shp_term_sim, lch_term_sim = [], [], [], []
     # depth_max = 20  # Wordnet 3.0 depth
     depth_max = max_dataset_depth(df)  # dataset taxonomy depth
-    for index, row in df.iterrows():
-        s_1 = wn.synsets(row['Word 1'])
-        s_2 = wn.synsets(row['Word 2'])
-        human_similarity.append(float(row['Human']))
-        max_wup_similarity = -1
-        max_shp_similarity = -1
-        max_lch_similarity = -1
-        for synset_1 in s_1:
-            for synset_2 in s_2:
-                lcs_tuple = lcs_path(synset_1, synset_2, 0)
-                if lcs_tuple is not None:
-                    least_common_subsumer = lcs_tuple[0]
-                    synsets_shortest_path = lcs_tuple[1]
-                    wu_sim = wu_palmer_similarity(synset_1, synset_2, least_common_subsumer)
-                    shp_sim = shortest_path_similarity(synset_1, synset_2, synsets_shortest_path, depth_max)
-                    lch_sim = lc_similarity(synset_1, synset_2, synsets_shortest_path, depth_max)
-                    if wu_sim is not None:
-                        if wu_sim > max_wup_similarity:
-                            max_wup_similarity = wu_sim
-                    if shp_sim is not None:
-                        if shp_sim > max_shp_similarity:
-                            max_shp_similarity = shp_sim
-                    if lch_sim is not None:
-                        if lch_sim > max_lch_similarity:
-                            max_lch_similarity = lch_sim
-        wup_term_sim.append(max_wup_similarity)
-        shp_term_sim.append(max_shp_similarity)
-        lch_term_sim.append(max_lch_similarity)
-    return human_similarity, wup_term_sim, shp_term_sim, lch_term_sim
+    human_similarity = df['Human'].astype(float).tolist()
+    wup_term_sim, shp_term_sim, lch_term_sim = batch_max_term_similarity(
+        zip(df['Word 1'].astype(str), df['Word 2'].astype(str)), depth_max)
+    return human_similarity, wup_term_sim.tolist(), shp_term_sim.tolist(), lch_term_sim.tolist()
+
+
+def batch_max_term_similarity(word_pairs, depth_max, chunk_size=1000000):
+    """
+    Compute the max Wu Palmer, Shortest Path and Leacock Chodorow similarity between the synsets of each pair
+    of terms. The synsets are resolved in rows of the taxonomy index, the similarities of all the synset pairs
+    are computed with array operations (chunk_size synset pairs at a time) and reduced to the max of each term pair
+    :param word_pairs: iterable of (word 1, word 2)
+    :param depth_max: the max depth of the taxonomy
+    :param chunk_size: max number of synset pairs scored at a time
+    :return: three numpy arrays (wup, shp, lch) with the max similarity of each term pair,
+    -1 if no pair of synsets has a least common subsumer
+    """
+    index = taxonomy_index()
+    word_rows = {}
+    similarities = []
+    chunk_pairs, chunk_rows_1, chunk_rows_2 = [], [], []
+    chunk_length = n_pairs = 0
+    for n_pairs, (word_1, word_2) in enumerate(word_pairs, start=1):
+        for word in (word_1, word_2):
+            if word not in word_rows:
+                word_rows[word] = np.array([-1 if row is None else row for row in map(index.row, wn.synsets(word))],
+                                           dtype=np.int64)
+        rows_1, rows_2 = word_rows[word_1], word_rows[word_2]
+        if len(rows_1) == 0 or len(rows_2) == 0:
+            continue
+        chunk_pairs.append((n_pairs - 1, len(rows_1) * len(rows_2)))
+        chunk_rows_1.append(np.repeat(rows_1, len(rows_2)))
+        chunk_rows_2.append(np.tile(rows_2, len(rows_1)))
+        chunk_length += len(rows_1) * len(rows_2)
+        if chunk_length >= chunk_size:
+            similarities.append(synset_pairs_max_similarity(index, chunk_pairs, chunk_rows_1, chunk_rows_2, depth_max))
+            chunk_pairs, chunk_rows_1, chunk_rows_2 = [], [], []
+            chunk_length = 0
+    if chunk_pairs:
+        similarities.append(synset_pairs_max_similarity(index, chunk_pairs, chunk_rows_1, chunk_rows_2, depth_max))
+    max_similarities = np.full((3, n_pairs), -1, dtype=np.float64)
+    for pair_ids, pair_similarities in similarities:
+        max_similarities[:, pair_ids] = pair_similarities
+    return max_similarities[0], max_similarities[1], max_similarities[2]
+
+
+def synset_pairs_max_similarity(index, pairs, rows_1, rows_2, depth_max):
+    """
+    Compute the similarities of a chunk of synset pairs and reduce them to the max of each term pair
+    :param index: the TaxonomyIndex
+    :param pairs: list of (term pair id, number of synset pairs), the synset pairs of a term pair are contiguous
+    :param rows_1: list of arrays with the rows of the first synsets
+    :param rows_2: list of arrays with the rows of the second synsets
+    :param depth_max: the max depth of the taxonomy
+    :return: tuple (term pair ids, array 3 x term pairs with the max wup, shp and lch)
+    """
+    _, _, wup, shp, lch = synset_pairs_similarity(index, np.concatenate(rows_1), np.concatenate(rows_2), depth_max)
+    pair_ids, counts = zip(*pairs)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.array(pair_ids), np.maximum.reduceat(np.vstack((wup, shp, lch)), starts, axis=1)
+
+
+def synset_pairs_similarity(index, rows_1, rows_2, depth_max):
+    """
+    Compute the least common subsumer, the path and the three similarities of many synset pairs
+    :param index: the TaxonomyIndex
+    :param rows_1: numpy array with the rows of the first synsets
+    :param rows_2: numpy array with the rows of the second synsets
+    :param depth_max: the max depth of the taxonomy
+    :return: tuple of numpy arrays (lcs rows, paths, wup, shp, lch), -1 for the pairs without subsumer
+    """
+    lcs, paths, wup = synset_pairs_wu_palmer(index, rows_1, rows_2)
+    shp, lch = path_similarities(paths, depth_max)
+    return lcs, paths, wup, shp, lch
+
+
+def synset_pairs_wu_palmer(index, rows_1, rows_2):
+    """
+    Compute the least common subsumer, the path and the Wu Palmer similarity (the metrics that do not depend on
+    the max depth of the taxonomy) of many synset pairs
+    :param index: the TaxonomyIndex
+    :param rows_1: numpy array with the rows of the first synsets
+    :param rows_2: numpy array with the rows of the second synsets
+    :return: tuple of numpy arrays (lcs rows, paths, wup), -1 for the pairs without subsumer
+    """
+    lcs, paths = index.lcs_paths(rows_1, rows_2)
+    found = lcs >= 0
+    depth_sum = np.where(found, index.depths[rows_1] + index.depths[rows_2], 1)
+    wup = np.where(found, 2 * index.depths[lcs] / depth_sum, -1)
+    return lcs, paths, wup
+
+
+def path_similarities(paths, depth_max):
+    """
+    Compute the shortest path and Leacock Chodorow similarities from the paths of many synset pairs
+    :param paths: numpy array of paths, -1 for the pairs without subsumer
+    :param depth_max: the max depth of the taxonomy
+    :return: tuple of numpy arrays (shp, lch), -1 for the pairs without subsumer
+    """
+    found = paths >= 0
+    shp = np.where(found, 2 * depth_max - paths, -1)
+    lch = np.where(found, -np.log2((np.where(found, paths, 0) + 1) / (2 * depth_max + 1)), -1)
+    return shp, lch
 
 
 def read_csv(file_path):
@@ -207,7 +275,8 @@ def read_csv(file_path):
     return pd.read_csv(file_path)
 
 
-df = read_csv('WordSim353.csv')
-human_similarity, wup_term_sim, shp_term_sim, lch_term_sim = compute_max_term_similarity(df)
-# write_similarity(df,wup_term_sim,shp_term_sim,lch_term_sim)
-print_correlations(human_similarity, wup_term_sim, shp_term_sim, lch_term_sim)
+if __name__ == "__main__":
+    df = read_csv('WordSim353.csv')
+    human_similarity, wup_term_sim, shp_term_sim, lch_term_sim = compute_max_term_similarity(df)
+    # write_similarity(df,wup_term_sim,shp_term_sim,lch_term_sim)
+    print_correlations(human_similarity, wup_term_sim, shp_term_sim, lch_term_sim)
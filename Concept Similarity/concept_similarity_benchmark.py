@@ -0,0 +1,261 @@
+"""
+Speed and correctness benchmark of the concept similarity metrics against the NLTK ones
+(Synset.wup_similarity, path_similarity and lch_similarity).
+
+The implementations (hand-written pair by pair, hand-written batch and NLTK) are run on the synset pairs of
+WordSim353 and on random noun synset pairs of increasing size, reporting pairs/sec, p50/p99 latency and
+peak memory. The agreement between the hand-written and the NLTK metrics is reported too. The results are
+stored as a JSON baseline, and the following runs are compared with it to spot the regressions.
+
+Usage:
+    python concept_similarity_benchmark.py --sizes 1000 10000 100000 --save-baseline
+    python concept_similarity_benchmark.py --sizes 1000 10000 100000 --compare
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import WordNetError
+from scipy.stats import spearmanr
+
+from concept_similarity import taxonomy_index, depth_table, max_dataset_depth, read_csv, lcs_path, \
+    wu_palmer_similarity, shortest_path_similarity, lc_similarity, synset_pairs_similarity
+
+BASELINE_PATH = "benchmark_baseline.json"
+BATCH_SIZE = 10000
+
+
+def handwritten_similarity(pairs, depth_max):
+    """
+    Hand-written metrics, computed pair by pair
+    :param pairs: list of synset pairs
+    :param depth_max: the max depth of the taxonomy
+    :return: generator of the (wup, shp, lch) tuples of a call, one for each pair
+    """
+    for synset_1, synset_2 in pairs:
+        lcs_tuple = lcs_path(synset_1, synset_2, 0)
+        if lcs_tuple is None:
+            yield [(None, None, None)]
+        else:
+            lcs, path = lcs_tuple
+            yield [(wu_palmer_similarity(synset_1, synset_2, lcs),
+                    shortest_path_similarity(synset_1, synset_2, path, depth_max),
+                    lc_similarity(synset_1, synset_2, path, depth_max))]
+
+
+def handwritten_batch_similarity(pairs, depth_max):
+    """
+    Hand-written metrics, computed with array operations BATCH_SIZE pairs at a time
+    :param pairs: list of synset pairs
+    :param depth_max: the max depth of the taxonomy
+    :return: generator of the list of (wup, shp, lch) tuples of a call, one for each pair of the batch
+    """
+    index = taxonomy_index()
+    for start in range(0, len(pairs), BATCH_SIZE):
+        batch = pairs[start:start + BATCH_SIZE]
+        rows_1 = np.array([-1 if row is None else row for row in (index.row(s) for s, _ in batch)], dtype=np.int64)
+        rows_2 = np.array([-1 if row is None else row for row in (index.row(s) for _, s in batch)], dtype=np.int64)
+        lcs, _, wup, shp, lch = synset_pairs_similarity(index, rows_1, rows_2, depth_max)
+        yield [(None, None, None) if l < 0 else (w, s, c)
+               for l, w, s, c in zip(lcs.tolist(), wup.tolist(), shp.tolist(), lch.tolist())]
+
+
+def nltk_similarity(pairs, depth_max):
+    """
+    NLTK metrics, computed pair by pair (None if a metric is not defined for the pair)
+    :param pairs: list of synset pairs
+    :param depth_max: unused, the NLTK metrics use the depth of the whole taxonomy
+    :return: generator of the (wup, path, lch) tuples of a call, one for each pair
+    """
+    for synset_1, synset_2 in pairs:
+        yield [(nltk_metric(synset_1.wup_similarity, synset_2), nltk_metric(synset_1.path_similarity, synset_2),
+                nltk_metric(synset_1.lch_similarity, synset_2))]
+
+
+def nltk_metric(metric, synset):
+    """
+    :param metric: the bound NLTK similarity method
+    :param synset: the other synset
+    :return: the similarity, None if it is not defined (e.g. the synsets have a different POS)
+    """
+    try:
+        return metric(synset)
+    except WordNetError:
+        return None
+
+
+IMPLEMENTATIONS = {"handwritten": handwritten_similarity,
+                   "handwritten_batch": handwritten_batch_similarity,
+                   "nltk": nltk_similarity}
+
+
+def run(implementation, pairs, depth_max):
+    """
+    Run an implementation on a workload, timing each call
+    :param implementation: function (pairs, depth_max) -> generator of the results of each call
+    :param pairs: list of synset pairs
+    :param depth_max: the max depth of the taxonomy
+    :return: tuple (list of results, one for each pair, list of (call latency in ms, pairs of the call))
+    """
+    results, latencies = [], []
+    calls = implementation(pairs, depth_max)
+    while True:
+        start = time.perf_counter()
+        call_results = next(calls, None)
+        elapsed = (time.perf_counter() - start) * 1000
+        if call_results is None:
+            return results, latencies
+        results.extend(call_results)
+        latencies.append((elapsed, len(call_results)))
+
+
+def benchmark(implementation, pairs, depth_max):
+    """
+    Measure the throughput, the latency and the peak memory of an implementation on a workload.
+    The memory is measured in a second run, since tracemalloc slows down the execution
+    :param implementation: function (pairs, depth_max) -> generator of the results of each call
+    :param pairs: list of synset pairs
+    :param depth_max: the max depth of the taxonomy
+    :return: tuple (list of results, dict with the statistics)
+    """
+    start = time.perf_counter()
+    results, latencies = run(implementation, pairs, depth_max)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run(implementation, pairs, depth_max)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    call_latencies = np.array([latency for latency, _ in latencies])
+    return results, {"pairs": len(pairs), "seconds": elapsed,
+                     "pairs_per_second": len(pairs) / elapsed if elapsed else 0,
+                     "pairs_per_call": len(pairs) / len(latencies) if latencies else 0,
+                     "p50_ms": float(np.percentile(call_latencies, 50)) if latencies else 0,
+                     "p99_ms": float(np.percentile(call_latencies, 99)) if latencies else 0,
+                     "peak_memory_kb": peak_memory / 1024}
+
+
+def agreement(handwritten, nltk, pairs):
+    """
+    Compare the hand-written metrics with the NLTK ones: Wu Palmer directly, the path as the NLTK path similarity
+    1 / (path + 1), and Leacock Chodorow (log2 and dataset depth instead of the natural log and the taxonomy depth)
+    only with the rank correlation
+    :param handwritten: list of (wup, shp, lch) tuples
+    :param nltk: list of (wup, path, lch) tuples
+    :param pairs: list of synset pairs
+    :return: dict{metric: agreement statistics}
+    """
+    path_similarities = []
+    for synset_1, synset_2 in pairs:
+        lcs_tuple = lcs_path(synset_1, synset_2, 0)
+        path_similarities.append(None if lcs_tuple is None else 1 / (lcs_tuple[1] + 1))
+    compared = {"wup": ([h[0] for h in handwritten], [n[0] for n in nltk], True),
+                "path": (path_similarities, [n[1] for n in nltk], True),
+                "lch": ([h[2] for h in handwritten], [n[2] for n in nltk], False)}
+    statistics = {}
+    for metric, (values, nltk_values, same_scale) in compared.items():
+        both = [(v, n) for v, n in zip(values, nltk_values) if v is not None and n is not None]
+        metric_statistics = {"pairs": len(pairs), "defined_both": len(both),
+                             "defined_only_handwritten": sum(v is not None and n is None
+                                                             for v, n in zip(values, nltk_values)),
+                             "defined_only_nltk": sum(v is None and n is not None
+                                                      for v, n in zip(values, nltk_values))}
+        if both:
+            values_both, nltk_both = np.array(both, dtype=np.float64).T
+            metric_statistics["spearman"] = float(spearmanr(values_both, nltk_both)[0]) if len(both) > 1 else None
+            if same_scale:
+                differences = np.abs(values_both - nltk_both)
+                metric_statistics.update(mean_abs_diff=float(differences.mean()), max_abs_diff=float(differences.max()),
+                                         equal_rate=float(np.mean(differences < 1e-9)))
+        statistics[metric] = metric_statistics
+    return statistics
+
+
+def wordsim_workload(file_path="WordSim353.csv"):
+    """
+    :return: tuple (all the synset pairs of the WordSim353 word pairs, the dataset max depth)
+    """
+    df = read_csv(file_path)
+    pairs = [(synset_1, synset_2) for word_1, word_2 in zip(df['Word 1'].astype(str), df['Word 2'].astype(str))
+             for synset_1 in wn.synsets(word_1) for synset_2 in wn.synsets(word_2)]
+    return pairs, max_dataset_depth(df)
+
+
+def random_workload(size, seed=0):
+    """
+    :return: tuple (random noun synset pairs, max depth of their taxonomy)
+    """
+    nouns = list(wn.all_synsets('n'))
+    rng = random.Random(seed)
+    pairs = [(rng.choice(nouns), rng.choice(nouns)) for _ in range(size)]
+    table = depth_table()
+    return pairs, max(table.synset_depth(syn) for pair in pairs for syn in pair)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare the throughput with a baseline
+    :param results: the benchmark results
+    :param baseline: the baseline results
+    :param tolerance: max accepted relative slowdown
+    :return: list of the regressions (strings)
+    """
+    regressions = []
+    for workload, implementations in results["workloads"].items():
+        for name, statistics in implementations.items():
+            reference = baseline.get("workloads", {}).get(workload, {}).get(name)
+            if reference is None or not reference["pairs_per_second"]:
+                continue
+            ratio = statistics["pairs_per_second"] / reference["pairs_per_second"]
+            print("{} {}: {:.2f}x the baseline throughput".format(workload, name, ratio))
+            if ratio < 1 - tolerance:
+                regressions.append("{} {} is {:.0%} slower".format(workload, name, 1 - ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the concept similarity metrics against NLTK")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="sizes of the random workloads")
+    parser.add_argument("--implementations", nargs="+", default=list(IMPLEMENTATIONS), choices=list(IMPLEMENTATIONS))
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="max accepted slowdown when comparing")
+    args = parser.parse_args()
+
+    taxonomy_index()
+    workloads = {"wordsim353": wordsim_workload()}
+    workloads.update({"random_{}".format(size): random_workload(size) for size in args.sizes})
+    benchmark_results = {"workloads": {}, "agreement": {}}
+    for workload_name, (workload_pairs, workload_depth_max) in workloads.items():
+        benchmark_results["workloads"][workload_name] = {}
+        outputs = {}
+        for implementation_name in args.implementations:
+            outputs[implementation_name], implementation_statistics = benchmark(
+                IMPLEMENTATIONS[implementation_name], workload_pairs, workload_depth_max)
+            benchmark_results["workloads"][workload_name][implementation_name] = implementation_statistics
+            print("{} {}: {pairs_per_second:.0f} pairs/s, p50 {p50_ms:.3f} ms, p99 {p99_ms:.3f} ms "
+                  "({pairs_per_call:.0f} pairs/call), peak memory {peak_memory_kb:.0f} KB".format(
+                   workload_name, implementation_name, **implementation_statistics))
+        handwritten_outputs = outputs.get("handwritten", outputs.get("handwritten_batch"))
+        if handwritten_outputs is not None and "nltk" in outputs:
+            benchmark_results["agreement"][workload_name] = agreement(handwritten_outputs, outputs["nltk"],
+                                                                      workload_pairs)
+            print("{} agreement: {}".format(workload_name, json.dumps(benchmark_results["agreement"][workload_name])))
+
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(benchmark_results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("Regression: {}".format(regression))
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(benchmark_results, f, indent=2)
+    if args.compare and regressions:
+        sys.exit(1)
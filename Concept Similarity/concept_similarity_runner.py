@@ -0,0 +1,177 @@
+"""
+Evaluate the Wu Palmer, Shortest Path and Leacock Chodorow similarities on any number of datasets of
+human annotated word pairs, writing the Pearson and Spearman correlations in a report.
+
+The least common subsumer, the path and the Wu Palmer similarity of the synset pairs are kept in an on-disk
+SQLite cache, so the pairs shared by different datasets, or by different runs, are computed only once; the Shortest
+Path and Leacock Chodorow similarities are derived from the path and the max depth of each dataset. The missing
+pairs are computed by a pool of processes sharing the taxonomy index.
+
+Usage:
+    python concept_similarity_runner.py WordSim353.csv SimLex-999.txt RG65.csv --processes 8
+"""
+
+import argparse
+import csv
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from nltk.corpus import wordnet as wn
+from scipy.stats import pearsonr, spearmanr
+
+from concept_similarity import taxonomy_index, max_dataset_depth, synset_pairs_wu_palmer, path_similarities
+from synset_pair_cache import SynsetPairCache
+
+METRICS = ("Wu-Palmer", "Shortest-Path", "Leakock-Chodorow")
+DATASET_COLUMNS = ['Word 1', 'Word 2', 'Human']
+# (word 1, word 2, human score) columns of the known datasets
+KNOWN_DATASET_COLUMNS = [('word1', 'word2', 'SimLex999')]
+
+
+def read_dataset(file_path, columns=None, header="infer"):
+    """
+    Read a dataset of human annotated word pairs (the separator is detected). The word and score columns are, in
+    order: the given ones, 'Word 1', 'Word 2' and 'Human', the ones of a known dataset (e.g. SimLex-999), or the
+    first three columns
+    :param file_path: path of the file to read
+    :param columns: optional (word 1, word 2, human score) columns, names or positions (0 based)
+    :param header: True if the first row is the header, False if the file has no header, "infer" to consider
+    the first row a header if it contains no number
+    :return: dataframe with the columns 'Word 1', 'Word 2' and 'Human' (float)
+    :raise ValueError: if the score column is not numeric
+    """
+    df = pd.read_csv(file_path, sep=None, engine="python", header=None, dtype=str, skipinitialspace=True)
+    if header == "infer":
+        header = not any(_is_number(value) for value in df.iloc[0])
+    if header:
+        df.columns = [str(column).strip() for column in df.iloc[0]]
+        df = df.iloc[1:].reset_index(drop=True)
+    if columns is None:
+        candidates = [DATASET_COLUMNS] + KNOWN_DATASET_COLUMNS
+        columns = next((list(c) for c in candidates if set(c) <= set(df.columns)), list(df.columns[:3]))
+    columns = [column if column in df.columns else df.columns[int(column)] for column in columns]
+    df = df[columns].set_axis(DATASET_COLUMNS, axis=1)
+    try:
+        return df.astype({'Human': float})
+    except ValueError as e:
+        raise ValueError("The score column '{}' of {} is not numeric, select the dataset columns (--columns): {}"
+                         .format(columns[2], file_path, e))
+
+
+def _is_number(value):
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def compute_synset_pairs(pairs):
+    """
+    Compute the least common subsumer, the path and the Wu Palmer similarity of a chunk of synset pairs in a
+    worker process
+    :param pairs: list of (synset name 1, synset name 2)
+    :return: list of (synset name 1, synset name 2, lcs, path, wup), None values if there is no subsumer
+    """
+    index = taxonomy_index()
+    rows_1 = np.array([index.rows.get(name, -1) for name, _ in pairs], dtype=np.int64)
+    rows_2 = np.array([index.rows.get(name, -1) for _, name in pairs], dtype=np.int64)
+    values = zip(*(array.tolist() for array in synset_pairs_wu_palmer(index, rows_1, rows_2)))
+    return [(name_1, name_2, None, None, None) if lcs < 0 else (name_1, name_2, index.synsets[lcs].name(), path, wup)
+            for (name_1, name_2), (lcs, path, wup) in zip(pairs, values)]
+
+
+def evaluate_dataset(df, cache, pool, depth_max=None, chunk_size=20000):
+    """
+    Compute the max similarity between the synsets of each word pair of a dataset, computing only the
+    synset pairs missing from the cache. The Shortest Path and Leacock Chodorow similarities are derived from the
+    cached paths and the max depth
+    :param df: dataframe with the columns 'Word 1', 'Word 2' and 'Human'
+    :param cache: the SynsetPairCache
+    :param pool: the pool of processes computing the missing pairs
+    :param depth_max: the max depth of the taxonomy, computed on the dataset words if missing
+    :param chunk_size: number of synset pairs sent to a worker at a time
+    :return: tuple (depth max, numpy array word pairs x 3 with the max wup, shp and lch, number of computed pairs)
+    """
+    if depth_max is None:
+        depth_max = max_dataset_depth(df)
+    word_synsets = {}
+    for word in set(df['Word 1'].astype(str)) | set(df['Word 2'].astype(str)):
+        word_synsets[word] = [syn.name() for syn in wn.synsets(word)]
+    term_pairs = [(word_synsets[word_1], word_synsets[word_2])
+                  for word_1, word_2 in zip(df['Word 1'].astype(str), df['Word 2'].astype(str))]
+    pairs = {cache.key(name_1, name_2) for names_1, names_2 in term_pairs for name_1 in names_1 for name_2 in names_2}
+    cached = cache.get_many(pairs)
+    missing = sorted(pairs - cached.keys())
+    tasks = (missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size))
+    for computed in pool.imap_unordered(compute_synset_pairs, tasks):
+        cache.put_many(computed)
+        cached.update({(name_1, name_2): tuple(values) for name_1, name_2, *values in computed})
+    positions = {pair: i for i, pair in enumerate(cached)}
+    paths = np.array([-1 if lcs is None else path for lcs, path, _ in cached.values()], dtype=np.int64)
+    wup = np.array([-1 if lcs is None else wup for lcs, _, wup in cached.values()], dtype=np.float64)
+    pair_scores = np.column_stack((wup, *path_similarities(paths, depth_max)))
+    scores = np.full((len(term_pairs), len(METRICS)), -1, dtype=np.float64)
+    for i, (names_1, names_2) in enumerate(term_pairs):
+        rows = [positions[cache.key(name_1, name_2)] for name_1 in names_1 for name_2 in names_2]
+        if rows:
+            scores[i] = np.maximum(scores[i], pair_scores[rows].max(axis=0))
+    return depth_max, scores, len(missing)
+
+
+def correlation_report(dataset, df, depth_max, scores):
+    """
+    Compute the Pearson and Spearman correlations between the human annotations and each metric
+    :param dataset: the dataset name
+    :param df: dataframe with the column 'Human'
+    :param depth_max: the max depth of the taxonomy
+    :param scores: numpy array word pairs x metrics
+    :return: list of report rows (dict)
+    """
+    human_similarity = df['Human'].astype(float).to_numpy()
+    report = []
+    for metric, metric_scores in zip(METRICS, scores.T):
+        pearson, spearman = pearsonr(human_similarity, metric_scores), spearmanr(human_similarity, metric_scores)
+        report.append({"dataset": dataset, "pairs": len(df), "depth_max": depth_max, "metric": metric,
+                       "pearson": pearson[0], "pearson_pvalue": pearson[1],
+                       "spearman": spearman[0], "spearman_pvalue": spearman[1]})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correlation between human annotations and concept similarities")
+    parser.add_argument("datasets", nargs="+", help="CSV files of word pairs with a human similarity score")
+    parser.add_argument("--columns", nargs=3, default=None, metavar=("WORD_1", "WORD_2", "HUMAN"),
+                        help="names or positions (0 based) of the word and score columns of the datasets "
+                             "(detected if missing)")
+    parser.add_argument("--no-header", action="store_true",
+                        help="the datasets have no header row (detected if missing)")
+    parser.add_argument("--cache", default="synset_pair_cache.sqlite", help="SQLite cache of the synset pairs")
+    parser.add_argument("--report", default="correlation_report.csv")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--depth-max", type=int, default=None,
+                        help="max depth of the taxonomy for all the datasets (computed on each dataset if missing)")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="synset pairs sent to a worker at a time")
+    args = parser.parse_args()
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        taxonomy_index()
+    else:
+        context = multiprocessing.get_context()
+    report_rows = []
+    with SynsetPairCache(args.cache) as synset_pair_cache, context.Pool(args.processes) as process_pool:
+        for dataset_path in args.datasets:
+            dataset_df = read_dataset(dataset_path, args.columns, False if args.no_header else "infer")
+            dataset_depth_max, dataset_scores, computed_pairs = evaluate_dataset(
+                dataset_df, synset_pair_cache, process_pool, args.depth_max, args.chunk_size)
+            print("{}: {} word pairs, depth max {}, {} synset pairs computed".format(
+                dataset_path, len(dataset_df), dataset_depth_max, computed_pairs))
+            for row in correlation_report(dataset_path, dataset_df, dataset_depth_max, dataset_scores):
+                print("  {metric}: Pearson {pearson:.4f}, Spearman {spearman:.4f}".format(**row))
+                report_rows.append(row)
+    with open(args.report, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(report_rows[0]))
+        writer.writeheader()
+        writer.writerows(report_rows)
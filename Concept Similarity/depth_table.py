@@ -0,0 +1,77 @@
+import json
+import os
+
+
+class DepthTable:
+    """
+    Persistent table with the length of the longest hypernym path of each synset (from the root to the synset,
+    both included, i.e. max(len(path) for path in synset.hypernym_paths())) and with the max one among
+    the synsets of each word. The lengths are memoized, so each synset is visited once (the paths are never
+    enumerated) and, once the table is persisted, only the new words of a dataset are looked up in Wordnet
+    """
+
+    def __init__(self, file_path=None):
+        """
+        :param file_path: optional file where the table is persisted, loaded if it exists
+        """
+        self.file_path = file_path
+        self.synsets = {}
+        self.words = {}
+        self.modified = False
+        if file_path is not None and os.path.exists(file_path):
+            self.load(file_path)
+
+    def synset_depth(self, syn):
+        """
+        Return the length of the longest hypernym path of a synset
+        :param syn: the synset
+        :return: number of synsets in the path
+        """
+        name = syn.name()
+        if name not in self.synsets:
+            hypernyms = syn.hypernyms() + syn.instance_hypernyms()
+            self.synsets[name] = 1 + max((self.synset_depth(h) for h in hypernyms), default=0)
+            self.modified = True
+        return self.synsets[name]
+
+    def word_depth(self, word, wordnet):
+        """
+        Return the length of the longest hypernym path among the synsets of a word
+        :param word: the word
+        :param wordnet: the Wordnet corpus reader
+        :return: number of synsets in the path, 0 if the word has no synsets
+        """
+        if word not in self.words:
+            self.words[word] = max((self.synset_depth(syn) for syn in wordnet.synsets(word)), default=0)
+            self.modified = True
+        return self.words[word]
+
+    def max_depth(self, words, wordnet):
+        """
+        Return the length of the longest hypernym path among the synsets of some words
+        :param words: iterable of words
+        :param wordnet: the Wordnet corpus reader
+        :return: number of synsets in the path
+        """
+        return max((self.word_depth(word, wordnet) for word in set(words)), default=0)
+
+    def save(self, file_path=None):
+        """
+        Persist the table on disk
+        :param file_path: output path, the one given at construction time if missing
+        :return: -
+        """
+        with open(file_path or self.file_path, "w") as f:
+            json.dump({"synsets": self.synsets, "words": self.words}, f)
+        self.modified = False
+
+    def load(self, file_path):
+        """
+        Load a table persisted with save
+        :param file_path: the table file
+        :return: -
+        """
+        with open(file_path) as f:
+            table = json.load(f)
+        self.synsets.update(table["synsets"])
+        self.words.update(table["words"])
@@ -0,0 +1,73 @@
+import sqlite3
+
+
+class SynsetPairCache:
+    """
+    On-disk (SQLite) cache of the synset pairs: (synset 1, synset 2) -> (least common subsumer, path, Wu Palmer).
+    The metrics are symmetric, so the pair is kept with the synset names sorted. The pairs without a least common
+    subsumer are cached too, with NULL values. None of the cached values depends on the max depth of the taxonomy,
+    so a pair is computed once for all the datasets: the Shortest Path and Leacock Chodorow similarities are
+    derived from the path and the max depth when the pairs are read
+    """
+    COLUMNS = ("lcs", "path", "wup")
+
+    def __init__(self, file_path):
+        """
+        :param file_path: the SQLite database, created if missing
+        """
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(synset_pairs)")]
+        if "depth_max" in columns:  # cache keyed by the max depth, written by an older version
+            self.connection.execute("DROP TABLE synset_pairs")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS synset_pairs ("
+                                "synset_1 TEXT NOT NULL, synset_2 TEXT NOT NULL, lcs TEXT, path INTEGER, wup REAL, "
+                                "PRIMARY KEY (synset_1, synset_2)) WITHOUT ROWID")
+        self.connection.commit()
+
+    @staticmethod
+    def key(synset_1, synset_2):
+        """
+        :return: the cache key of a pair of synset names
+        """
+        return (synset_1, synset_2) if synset_1 <= synset_2 else (synset_2, synset_1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM synset_pairs").fetchone()[0]
+
+    def get_many(self, pairs):
+        """
+        Return the cached values of some synset pairs
+        :param pairs: iterable of (synset name 1, synset name 2)
+        :return: dict{sorted pair: (lcs, path, wup)} with the cached pairs
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_pairs (synset_1 TEXT, synset_2 TEXT)")
+        cursor.execute("DELETE FROM wanted_pairs")
+        cursor.executemany("INSERT INTO wanted_pairs VALUES (?, ?)", {self.key(*pair) for pair in pairs})
+        rows = cursor.execute("SELECT p.synset_1, p.synset_2, p.lcs, p.path, p.wup "
+                              "FROM wanted_pairs w JOIN synset_pairs p "
+                              "ON p.synset_1 = w.synset_1 AND p.synset_2 = w.synset_2")
+        cached = {(row[0], row[1]): row[2:] for row in rows}
+        cursor.execute("DELETE FROM wanted_pairs")
+        return cached
+
+    def put_many(self, values):
+        """
+        Cache the values of some synset pairs
+        :param values: iterable of (synset name 1, synset name 2, lcs, path, wup)
+        :return: -
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO synset_pairs VALUES (?, ?, ?, ?, ?)",
+            ((*self.key(synset_1, synset_2), *pair_values) for synset_1, synset_2, *pair_values in values))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,164 @@
+import numpy as np
+
+
+class TaxonomyIndex:
+    """
+    WordNet taxonomy where each synset has a single parent, its first hypernym (the synsets without hypernyms are
+    roots). The depths are precomputed and the ancestors are kept in binary lifting tables:
+    up[j][i] is the ancestor 2^j levels above synset i (a root is its own parent), so the least common subsumer
+    of two synsets is found with O(log depth) array lookups
+    """
+
+    def __init__(self, synsets, parents):
+        """
+        :param synsets: list of synsets
+        :param parents: list with the row of the parent of each synset, -1 for the roots
+        """
+        self.synsets = synsets
+        self.rows = {syn.name(): i for i, syn in enumerate(synsets)}
+        parents = np.asarray(parents, dtype=np.int64)
+        roots = parents < 0
+        parents[roots] = np.flatnonzero(roots)
+        self.depths = self.__compute_depths(parents)
+        up = [parents]
+        for _ in range(max(1, int(self.depths.max(initial=0)).bit_length()) - 1):
+            up.append(up[-1][up[-1]])
+        self.up = np.array(up)
+        self.__depths = self.depths.tolist()
+        self.__up = [level.tolist() for level in up]
+
+    @staticmethod
+    def __compute_depths(parents):
+        """
+        Compute the depth of each synset, following the parents up to the first synset with a known depth
+        :param parents: array with the parent of each synset (roots are their own parent)
+        :return: numpy array of depths
+        """
+        parent_list = parents.tolist()
+        depths = [-1] * len(parent_list)
+        for i in range(len(parent_list)):
+            chain = []
+            node = i
+            while depths[node] < 0 and parent_list[node] != node:
+                chain.append(node)
+                node = parent_list[node]
+            if depths[node] < 0:
+                depths[node] = 0
+            for d, child in enumerate(reversed(chain), start=depths[node] + 1):
+                depths[child] = d
+        return np.array(depths, dtype=np.int64)
+
+    @classmethod
+    def from_wordnet(cls, wordnet):
+        """
+        Build the index of all the WordNet synsets
+        :param wordnet: the WordNet corpus reader
+        :return: TaxonomyIndex
+        """
+        synsets = list(wordnet.all_synsets())
+        rows = {syn.name(): i for i, syn in enumerate(synsets)}
+        parents = []
+        for syn in synsets:
+            hypernyms = syn.hypernyms()
+            parents.append(rows.get(hypernyms[0].name(), -1) if hypernyms else -1)
+        return cls(synsets, parents)
+
+    def __len__(self):
+        return len(self.synsets)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def row(self, sense):
+        """
+        :param sense: the synset
+        :return: the row of the synset, None if it is not indexed
+        """
+        return self.rows.get(sense.name()) if sense is not None else None
+
+    def depth(self, row):
+        """
+        :param row: the synset row (None for a synset not indexed, that is an isolated root)
+        :return: the depth of the synset
+        """
+        return self.__depths[row] if row is not None else 0
+
+    def ancestor(self, row, levels):
+        """
+        Return the ancestor some levels above a synset (the root if the synset is not deep enough)
+        :param row: the synset row
+        :param levels: number of levels
+        :return: the row of the ancestor
+        """
+        j = 0
+        while levels:
+            if levels & 1:
+                row = self.__up[j][row]
+            levels >>= 1
+            j += 1
+        return row
+
+    def lcs_path(self, row_1, row_2):
+        """
+        Compute the least common subsumer of two synsets and their path, with the same semantics of the
+        recursive visit of the first hypernyms: the deepest synset is moved up to the depth of the other one,
+        then both are moved up until their parents are the same. So if a synset is an ancestor of the other
+        (or the synsets are the same) the subsumer is its parent, and there is no subsumer if it is a root
+        :param row_1: row of the first synset
+        :param row_2: row of the second synset
+        :return: (row of the least common subsumer, path between the synsets), None if they have no subsumer
+        """
+        if row_1 is None or row_2 is None:
+            return None
+        depth_1, depth_2 = self.__depths[row_1], self.__depths[row_2]
+        if depth_1 > depth_2:
+            row_1 = self.ancestor(row_1, depth_1 - depth_2)
+        elif depth_2 > depth_1:
+            row_2 = self.ancestor(row_2, depth_2 - depth_1)
+        depth = min(depth_1, depth_2)
+        if depth == 0:
+            return None
+        path = abs(depth_1 - depth_2)
+        if row_1 == row_2:
+            return self.__up[0][row_1], path + 2
+        for level in reversed(self.__up):
+            if level[row_1] != level[row_2]:
+                row_1, row_2 = level[row_1], level[row_2]
+        parent = self.__up[0][row_1]
+        if parent != self.__up[0][row_2]:
+            return None
+        return parent, path + 2 * (depth - self.__depths[parent])
+
+    def ancestors(self, rows, levels):
+        """
+        Vectorized ancestor: return the ancestor some levels above each synset
+        :param rows: numpy array of synset rows
+        :param levels: numpy array with the number of levels of each synset
+        :return: numpy array of ancestor rows
+        """
+        for j, level in enumerate(self.up):
+            rows = np.where((levels >> j) & 1, level[rows], rows)
+        return rows
+
+    def lcs_paths(self, rows_1, rows_2):
+        """
+        Vectorized lcs_path: compute the least common subsumer and the path of many pairs of synsets at once
+        :param rows_1: numpy array with the rows of the first synsets (-1 for a synset not indexed)
+        :param rows_2: numpy array with the rows of the second synsets (-1 for a synset not indexed)
+        :return: tuple (numpy array of subsumer rows, numpy array of paths), both -1 for the pairs without subsumer
+        """
+        rows_1, rows_2 = np.asarray(rows_1, dtype=np.int64), np.asarray(rows_2, dtype=np.int64)
+        indexed = (rows_1 >= 0) & (rows_2 >= 0)
+        rows_1, rows_2 = np.where(indexed, rows_1, 0), np.where(indexed, rows_2, 0)
+        depth_1, depth_2 = self.depths[rows_1], self.depths[rows_2]
+        rows_1 = self.ancestors(rows_1, np.maximum(depth_1 - depth_2, 0))
+        rows_2 = self.ancestors(rows_2, np.maximum(depth_2 - depth_1, 0))
+        depth = np.minimum(depth_1, depth_2)
+        for level in self.up[::-1]:
+            ancestors_1, ancestors_2 = level[rows_1], level[rows_2]
+            move = ancestors_1 != ancestors_2
+            rows_1, rows_2 = np.where(move, ancestors_1, rows_1), np.where(move, ancestors_2, rows_2)
+        parents = self.up[0][rows_1]
+        found = indexed & (depth > 0) & (parents == self.up[0][rows_2])
+        paths = np.abs(depth_1 - depth_2) + 2 * (depth - self.depths[parents])
+        return np.where(found, parents, -1), np.where(found, paths, -1)
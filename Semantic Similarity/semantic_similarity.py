@@ -1,14 +1,17 @@
-import csv
+import functools
 import itertools
 import re
 import statistics
-import math
+import numpy as np
 import pandas as pd
-import requests
 from scipy.stats.stats import pearsonr
 from scipy.stats.stats import spearmanr
 
+from utility.babelnet_client import BabelNetGlossClient
+from utility.nasari_embeddings import NasariEmbeddings
+
 BABELNET_KEY = "ffe50bfb-5dbc-4fe5-8120-45dced25d694"
+GLOSS_STORE_PATH = "data/babelnet_glosses.sqlite"
 
 
 def print_human_correlation(user_1_val, user_2_val):
@@ -24,32 +27,6 @@ def print_human_correlation(user_1_val, user_2_val):
     print(spearmanr(user_1_val, user_2_val))
 
 
-def gen_nasari_formatted_rows(stream):
-    """
-    Generator for reading the nasari file
-    :param stream: the file stream
-    :return: [BabelSyn,Lemma,Features
-    """
-    rows = csv.reader(stream)
-    for row in rows:
-        row = row[0].split("__")
-        vect = row[1].split("\t")
-        lemma = vect.pop(0)
-        yield [row[0], lemma, vect]
-
-
-def read_nasari(file_path):
-    """
-    Read the nasari file as a Dataframe
-    :param file_path:
-    :return: dataframe, each row is (BabelSyn, Lemma, Dict of Features)
-    """
-    with open(file_path, encoding="utf8") as f:
-        nasari_df = pd.DataFrame.from_records(list(gen_nasari_formatted_rows(f)),
-                                              columns=['BabelSyn', 'Lemma', 'Features'])
-    return nasari_df
-
-
 def read_semeval(file_path):
     """
     Read the semeval file and store it in a dictionary
@@ -63,69 +40,106 @@ def read_semeval(file_path):
         return dict(rows)
 
 
-def get_nasari(nasari_df, babel_syn_id):
-    """
-    Return the corresponding Nasari vectors given a BabelSynset Id
-    :param nasari_df: nasari vector in dataframe form
-    :param babel_syn_id: BabelSynset Id
-    :return: list of nasari vector
-    """
-    index = nasari_df[nasari_df['BabelSyn'] == babel_syn_id].first_valid_index()
-    if index is not None:
-        return list(nasari_df.iloc[index]['Features'])
-
-
-def cosine_similarity(nv1, nv2):
-    """
-    compute the cosine similarity between two nasari vector embedded
-    :param nv1: first nasari vector
-    :param nv2: second nasari vector
-    :return: number representing the cosine similarity
-    """
-    v1 = [float(i) for i in nv1]
-    v2 = [float(i) for i in nv2]
-    return (sum([v1[i] * v2[i] for i in range(len(v1))])) / (
-            (math.sqrt(sum(math.pow(v1[i], 2) for i in range(len(v1))))) * (
-        math.sqrt(sum(math.pow(v2[i], 2) for i in range(len(v2))))))
-
-
-def max_cosine_similarity(nasari_df, w1_senses, w2_senses):
+def max_cosine_similarity(nasari_embeddings, w1_senses, w2_senses):
     """
     compute the maximum cosine similarity for each sense of a term
+    :param nasari_embeddings: the NasariEmbeddings (normalized vectors, so the cosine is a dot product)
     :param w1_senses: list of babelsynsetID
     :param w2_senses: list of babelsynsetID
     :return: tuple containing the two senses that maximize the cosine similarity
     """
-    max_cs = -1
-    current_cs = -1
-    max_senses = ()
-    if w1_senses is not None and w2_senses is not None:
-        for s1 in w1_senses:
-            nasari_vect_1 = get_nasari(nasari_df, s1)
-            if nasari_vect_1 != [] and nasari_vect_1 is not None:
-                for s2 in w2_senses:
-                    nasari_vect_2 = get_nasari(nasari_df, s2)
-                    if nasari_vect_2 != [] and nasari_vect_2 is not None:
-                        current_cs = cosine_similarity(nasari_vect_1, nasari_vect_2)
-                        if current_cs > max_cs:
-                            max_cs = current_cs
-                            max_senses = (s1, s2)
-    return max_senses
-
-
-def get_babelnet_gloss(babel_synset_id):
-    """
-    Given a babelsynsetID query babelnet to get the gloss
+    return next(batch_max_cosine_similarity(nasari_embeddings, [(w1_senses, w2_senses)]))[0]
+
+
+def batch_max_cosine_similarity(nasari_embeddings, senses_pairs, block_size=4000000, chunk_size=100000):
+    """
+    Compute the senses that maximize the cosine similarity for each pair of terms of a dataset.
+    The term pairs are grouped in chunks and, for each chunk, the similarities between all the distinct senses
+    of the first terms and all the distinct senses of the second terms are computed with a single matrix product.
+    The sense pairs of each term pair are then gathered from the block and reduced to their argmax (the first one,
+    in the order of the senses, in case of ties). A chunk is closed when the block or the gathered sense pairs
+    would exceed block_size, or when it has chunk_size term pairs, so the memory is bounded whatever the size
+    of the dataset and the repetition of its terms
+    :param nasari_embeddings: the NasariEmbeddings
+    :param senses_pairs: iterable of (w1 senses, w2 senses), lists of babelsynsetID (or None)
+    :param block_size: max number of similarities computed with a matrix product, and of sense pairs in a chunk
+    :param chunk_size: max number of term pairs in a chunk
+    :return: generator of tuples (senses that maximize the similarity, similarity) for each term pair,
+    in the same order, ((), None) if the terms have no pair of senses with a vector
+    """
+    chunk, rows_1, rows_2, chunk_pairs = [], {}, {}, 0
+    for w1_senses, w2_senses in senses_pairs:
+        senses_1 = [s1 for s1 in w1_senses or () if s1 in nasari_embeddings]
+        senses_2 = [s2 for s2 in w2_senses or () if s2 in nasari_embeddings]
+        if not senses_1 or not senses_2:
+            senses_1 = senses_2 = []
+        term_rows_1 = [nasari_embeddings.row(s1) for s1 in senses_1]
+        term_rows_2 = [nasari_embeddings.row(s2) for s2 in senses_2]
+        term_pairs = len(senses_1) * len(senses_2)
+        block_rows_1 = len(rows_1) + len(set(term_rows_1) - rows_1.keys())
+        block_rows_2 = len(rows_2) + len(set(term_rows_2) - rows_2.keys())
+        if chunk and (block_rows_1 * block_rows_2 > block_size or chunk_pairs + term_pairs > block_size or
+                      len(chunk) >= chunk_size):
+            yield from _chunk_max_cosine_similarity(nasari_embeddings.matrix, chunk, rows_1, rows_2)
+            chunk, rows_1, rows_2, chunk_pairs = [], {}, {}, 0
+        chunk.append((senses_1, senses_2, [rows_1.setdefault(r1, len(rows_1)) for r1 in term_rows_1],
+                      [rows_2.setdefault(r2, len(rows_2)) for r2 in term_rows_2]))
+        chunk_pairs += term_pairs
+    if chunk:
+        yield from _chunk_max_cosine_similarity(nasari_embeddings.matrix, chunk, rows_1, rows_2)
+
+
+def _chunk_max_cosine_similarity(matrix, chunk, rows_1, rows_2):
+    """
+    Compute the senses that maximize the cosine similarity for a chunk of term pairs
+    :param matrix: the normalized nasari matrix
+    :param chunk: list of (w1 senses, w2 senses, w1 sense positions in the block, w2 sense positions in the block)
+    :param rows_1: dict{matrix row: block row} of the senses of the first terms
+    :param rows_2: dict{matrix row: block column} of the senses of the second terms
+    :return: generator of tuples (senses that maximize the similarity, similarity)
+    """
+    if not rows_1:
+        for _ in chunk:
+            yield (), None
+        return
+    block = matrix[list(rows_1)] @ matrix[list(rows_2)].T
+    counts = np.array([len(positions_1) * len(positions_2) for _, _, positions_1, positions_2 in chunk])
+    i = np.concatenate([np.repeat(positions_1, len(positions_2)) for _, _, positions_1, positions_2 in chunk])
+    j = np.concatenate([np.tile(positions_2, len(positions_1)) for _, _, positions_1, positions_2 in chunk])
+    similarities = block[i.astype(np.int64), j.astype(np.int64)]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    non_empty = counts > 0
+    max_similarities = np.full(len(chunk), -np.inf, dtype=np.float32)
+    max_similarities[non_empty] = np.maximum.reduceat(similarities, starts[non_empty])
+    groups = np.repeat(np.arange(len(chunk)), counts)
+    first_max = np.flatnonzero(similarities == max_similarities[groups])
+    argmax = np.full(len(chunk), -1, dtype=np.int64)
+    unique_groups, first = np.unique(groups[first_max], return_index=True)
+    argmax[unique_groups] = first_max[first] - starts[unique_groups]
+    for (senses_1, senses_2, _, _), best, similarity in zip(chunk, argmax.tolist(), max_similarities.tolist()):
+        if best < 0 or similarity <= -1:
+            yield (), None
+        else:
+            yield (senses_1[best // len(senses_2)], senses_2[best % len(senses_2)]), similarity
+
+
+@functools.lru_cache(maxsize=None)
+def babelnet_gloss_client():
+    """
+    Lazily create the BabelNet gloss client, with the glosses stored in GLOSS_STORE_PATH
+    :return: BabelNetGlossClient
+    """
+    return BabelNetGlossClient(BABELNET_KEY, GLOSS_STORE_PATH)
+
+
+def get_babelnet_gloss(babel_synset_id, gloss_client=None):
+    """
+    Given a babelsynsetID query babelnet to get the gloss (only if it is not in the gloss store)
     :param babel_synset_id: id whose gloss is to be found
+    :param gloss_client: optional BabelNetGlossClient, the default one if missing
     :return: a string containing the gloss
     """
-    URL = "https://babelnet.io/v5/getSynset?id={}&key={}".format(babel_synset_id, BABELNET_KEY)
-    babel_synset = requests.get(url=URL)
-    data = babel_synset.json()
-    if len(data['glosses']) > 0:
-        return data['glosses'][0]['gloss']
-    else:
-        return ""
+    return (gloss_client or babelnet_gloss_client()).gloss(babel_synset_id)
 
 
 def calculate_accuracy(file_path):
@@ -143,27 +157,26 @@ def calculate_accuracy(file_path):
     return acc_eval.count("1") / len(acc_eval)
 
 
-def get_best_sense_glosses(dataset_df, nasari_df, semeval_dict):
+def get_best_sense_glosses(dataset_df, nasari_df, semeval_dict, gloss_client=None):
     """
-    get the senses that maximize the cosine similarity and stores them into a list
+    get the senses that maximize the cosine similarity and stores them into a list.
+    The glosses of all the senses are fetched at once (deduplicated and concurrently) by the gloss client
     :param dataset_df: dataframe containing the dataset from where get the terms
-    :param nasari_df: dataframe containing all the nasari embedded vectors
+    :param nasari_df: NasariEmbeddings (or dataframe) containing all the nasari embedded vectors
     :param semeval_dict: dictionary contaninig (Word, babelsynsetId) from semeval 2017
-    :return: number representing the accuracy
+    :param gloss_client: optional BabelNetGlossClient, the default one if missing
+    :return: list of [term, gloss]
     """
-    user_1_val, user_2_val, glosses = [], [], []
-    for index, row in dataset_df.iterrows():
-        user_1_val.append(row['Val1'])
-        user_2_val.append(row['Val2'])
-        w1 = row['Word1']
-        w2 = row['Word2']
-        w1_senses = semeval_dict.get(w1)
-        w2_senses = semeval_dict.get(w2)
-        argmax_senses = max_cosine_similarity(nasari_df, w1_senses, w2_senses)
-        if argmax_senses != ():
-            glosses.append([w1, get_babelnet_gloss(argmax_senses[0])])
-            glosses.append([w2, get_babelnet_gloss(argmax_senses[1])])
-    return glosses
+    nasari_embeddings = nasari_df if isinstance(nasari_df, NasariEmbeddings) else \
+        NasariEmbeddings.from_dataframe(nasari_df)
+    words = list(zip(dataset_df['Word1'], dataset_df['Word2']))
+    senses_pairs = ((semeval_dict.get(w1), semeval_dict.get(w2)) for w1, w2 in words)
+    best_senses = [(w1, w2, argmax_senses) for (w1, w2), (argmax_senses, _)
+                   in zip(words, batch_max_cosine_similarity(nasari_embeddings, senses_pairs)) if argmax_senses != ()]
+    glosses = (gloss_client or babelnet_gloss_client()).glosses(
+        sense for _, _, argmax_senses in best_senses for sense in argmax_senses)
+    return [[word, glosses[sense]] for w1, w2, argmax_senses in best_senses
+            for word, sense in zip((w1, w2), argmax_senses)]
 
 
 def write_glosses_to_file(glosses):
@@ -177,13 +190,14 @@ def write_glosses_to_file(glosses):
             print("Termine: {}; Glossa: {}".format(word, gloss), file=text_file)
 
 
-nasari_df = read_nasari("data/mini_NASARI.tsv")
-semeval_dict = read_semeval("data/SemEval17_IT.txt")
-dataset_df = pd.read_csv('data/data_1.txt')
-glosses = get_best_sense_glosses(dataset_df, nasari_df, semeval_dict)
-write_glosses_to_file(glosses)
+if __name__ == "__main__":
+    nasari_embeddings = NasariEmbeddings.load("data/mini_NASARI.tsv")
+    semeval_dict = read_semeval("data/SemEval17_IT.txt")
+    dataset_df = pd.read_csv('data/data_1.txt')
+    glosses = get_best_sense_glosses(dataset_df, nasari_embeddings, semeval_dict)
+    write_glosses_to_file(glosses)
 
-print("Accuracy singoli termini utente S {}".format(calculate_accuracy("results/Accuracy_termini_S.txt")))
-print("Accuracy coppie utente S {}".format(calculate_accuracy("results/Accuracy_coppie_S.txt")))
-print("Accuracy singoli termini utente G {}".format(calculate_accuracy("results/Accuracy_termini_G.txt")))
-print("Accuracy coppie utente G {}".format(calculate_accuracy("results/Accuracy_coppie_G.txt")))
+    print("Accuracy singoli termini utente S {}".format(calculate_accuracy("results/Accuracy_termini_S.txt")))
+    print("Accuracy coppie utente S {}".format(calculate_accuracy("results/Accuracy_coppie_S.txt")))
+    print("Accuracy singoli termini utente G {}".format(calculate_accuracy("results/Accuracy_termini_G.txt")))
+    print("Accuracy coppie utente G {}".format(calculate_accuracy("results/Accuracy_coppie_G.txt")))
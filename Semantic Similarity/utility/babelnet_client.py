@@ -0,0 +1,173 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BABELNET_URL = "https://babelnet.io/v5"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class GlossStore:
+    """
+    On-disk (SQLite) store of the BabelNet glosses, keyed by BabelSynset Id. It can be shared by different threads
+    """
+
+    def __init__(self, file_path):
+        """
+        :param file_path: the SQLite database, created if missing (":memory:" for a store that is not persisted)
+        """
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS glosses (babel_synset_id TEXT PRIMARY KEY, gloss TEXT)")
+        self.connection.commit()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        with self.__lock:
+            return self.connection.execute("SELECT COUNT(*) FROM glosses").fetchone()[0]
+
+    def get_many(self, babel_synset_ids):
+        """
+        Return the stored glosses of some synsets
+        :param babel_synset_ids: list of BabelSynset Ids
+        :return: dict{BabelSynset Id: gloss} with the stored synsets
+        """
+        glosses = {}
+        with self.__lock:
+            for start in range(0, len(babel_synset_ids), 500):
+                chunk = babel_synset_ids[start:start + 500]
+                rows = self.connection.execute("SELECT babel_synset_id, gloss FROM glosses WHERE babel_synset_id IN "
+                                               "({})".format(",".join("?" * len(chunk))), chunk)
+                glosses.update(rows)
+        return glosses
+
+    def put(self, babel_synset_id, gloss):
+        """
+        Store the gloss of a synset
+        :param babel_synset_id: BabelSynset Id
+        :param gloss: the gloss
+        :return: -
+        """
+        with self.__lock:
+            self.connection.execute("INSERT OR REPLACE INTO glosses VALUES (?, ?)", (babel_synset_id, gloss))
+            self.connection.commit()
+
+    def close(self):
+        with self.__lock:
+            self.connection.close()
+
+
+class BabelNetGlossClient:
+    """
+    BabelNet client fetching the glosses of many synsets at once: the ids are deduplicated, the ones already in the
+    gloss store are never requested, and the others are fetched concurrently (bounded by max_workers) over a pooled
+    HTTP session, retrying with exponential backoff the rate limited and failed requests. Each fetched gloss is
+    written through to the store
+    """
+
+    def __init__(self, key, store=None, base_url=BABELNET_URL, max_workers=8, timeout=10, retries=3, backoff=0.5):
+        """
+        :param key: the BabelNet API key
+        :param store: GlossStore, or the path of its database (an in memory store if missing)
+        :param base_url: the BabelNet API url (e.g. a local stub server in the tests)
+        :param max_workers: max number of concurrent requests
+        :param timeout: seconds to wait for a response
+        :param retries: number of retries of a failed request
+        :param backoff: seconds waited before the first retry, doubled at each retry
+        """
+        self.key = key
+        self.store = store if isinstance(store, GlossStore) else GlossStore(store or ":memory:")
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def gloss(self, babel_synset_id):
+        """
+        Return the (first) gloss of a synset
+        :param babel_synset_id: BabelSynset Id
+        :return: the gloss, "" if the synset has no glosses
+        """
+        return self.glosses([babel_synset_id])[babel_synset_id]
+
+    def glosses(self, babel_synset_ids):
+        """
+        Return the glosses of many synsets, fetching concurrently only the ones missing from the store
+        :param babel_synset_ids: iterable of BabelSynset Ids (can contain duplicates)
+        :return: dict{BabelSynset Id: gloss}
+        :raise requests.RequestException: if a gloss can not be fetched (the fetched ones are stored anyway)
+        :raise ValueError: if a response is not a BabelNet synset, e.g. the message of an invalid key (the fetched
+        glosses are stored anyway)
+        """
+        babel_synset_ids = list(dict.fromkeys(babel_synset_ids))
+        glosses = self.store.get_many(babel_synset_ids)
+        missing = [babel_synset_id for babel_synset_id in babel_synset_ids if babel_synset_id not in glosses]
+        error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.__fetch, babel_synset_id): babel_synset_id for babel_synset_id in missing}
+            for future in as_completed(futures):
+                try:
+                    gloss = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    error = error or e
+                    continue
+                self.store.put(futures[future], gloss)
+                glosses[futures[future]] = gloss
+        if error is not None:
+            raise error
+        return glosses
+
+    def close(self):
+        self.session.close()
+
+    def __fetch(self, babel_synset_id):
+        """
+        Request the gloss of a synset, retrying with exponential backoff
+        :param babel_synset_id: BabelSynset Id
+        :return: the gloss, "" if the synset has no glosses
+        :raise ValueError: if the response is not a BabelNet synset
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get("{}/getSynset".format(self.base_url), timeout=self.timeout,
+                                            params={"id": babel_synset_id, "key": self.key})
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    response.raise_for_status()
+                    return self.__first_gloss(babel_synset_id, response)
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+            time.sleep(delay)
+
+    @staticmethod
+    def __first_gloss(babel_synset_id, response):
+        """
+        Extract the first gloss of a getSynset response
+        :param babel_synset_id: BabelSynset Id
+        :param response: the response
+        :return: the gloss, "" if the synset has no glosses
+        :raise ValueError: if the response is not a BabelNet synset
+        """
+        try:
+            glosses = response.json()['glosses']
+            return glosses[0]['gloss'] if len(glosses) > 0 else ""
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise ValueError("Unexpected BabelNet response for {}: {}".format(babel_synset_id, response.text[:200])) \
+                from e
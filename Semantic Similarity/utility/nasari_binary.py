@@ -0,0 +1,198 @@
+"""
+Compiled binary format for the nasari resources.
+
+The text releases are parsed once and written as a single file made of a small JSON header followed by raw,
+64 bytes aligned sections: interned strings (synsets, lemmas, feature words) and numeric arrays (CSR offsets,
+feature ids sorted inside each row, float32 weights and the inverted feature index, or L2 normalized float32
+embeddings).
+Loading a compiled file maps it in memory and wraps the sections with zero-copy numpy views, so different processes
+share the same pages.
+
+Usage:
+    python nasari_binary.py lexical nasari_small.txt nasari_small.nbin
+    python nasari_binary.py embedded mini_NASARI.tsv mini_NASARI.nbin
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b"NASARIB1"
+ALIGNMENT = 64
+LEXICAL = "lexical"
+EMBEDDED = "embedded"
+
+NasariBinary = namedtuple("NasariBinary", ["kind", "arrays", "strings"])
+
+
+def parse_lexical_nasari(stream):
+    """
+    Parse the lexical nasari format (BabelSyn;Lemma;feature_weight;...).
+    The feature ids are sorted inside each row, and the inverted index (feature -> rows containing it) is built too
+    :param stream: the file stream
+    :return: (dict of arrays {indptr, feature_ids, weights, feature_indptr, feature_rows},
+    dict of strings {synsets, lemmas, features})
+    """
+    synsets, lemmas, features = [], [], []
+    feature_ids, indptr, weights, vocabulary = [], [0], [], {}
+    for row in csv.reader(stream):
+        row = row[0].split(";")
+        synsets.append(row[0])
+        lemmas.append(row[1])
+        vector = dict((lambda fs: (fs[0], float(fs[1]) if len(fs) > 1 else 0))(lx.split("_")) for lx in row[2:])
+        entries = []
+        for feature, weight in vector.items():
+            if feature not in vocabulary:
+                vocabulary[feature] = len(features)
+                features.append(feature)
+            entries.append((vocabulary[feature], weight))
+        for feature_id, weight in sorted(entries):
+            feature_ids.append(feature_id)
+            weights.append(weight)
+        indptr.append(len(feature_ids))
+    arrays = {"indptr": np.array(indptr, dtype=np.int64),
+              "feature_ids": np.array(feature_ids, dtype=np.int32),
+              "weights": np.array(weights, dtype=np.float32)}
+    arrays["feature_indptr"], arrays["feature_rows"] = build_inverted_index(arrays["indptr"], arrays["feature_ids"],
+                                                                            len(features))
+    return arrays, {"synsets": synsets, "lemmas": lemmas, "features": features}
+
+
+def build_inverted_index(indptr, feature_ids, features_count):
+    """
+    Build the inverted index, in CSR form, from each feature to the rows that contain it:
+    feature_rows[feature_indptr[f]:feature_indptr[f + 1]]
+    :param indptr: the CSR row offsets
+    :param feature_ids: the feature ids of the rows
+    :param features_count: the size of the features vocabulary
+    :return: (feature_indptr, feature_rows)
+    """
+    entry_rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(feature_ids, kind='stable')
+    counts = np.bincount(feature_ids, minlength=features_count)
+    feature_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return feature_indptr, entry_rows[order]
+
+
+def parse_embedded_nasari(stream):
+    """
+    Parse the embedded nasari format (BabelSyn__Lemma<TAB>v1<TAB>v2...)
+    The vectors are L2 normalized, so a compiled file is used as it is (the cosine similarity does not change)
+    :param stream: the file stream
+    :return: (dict of arrays {normalized_vectors}, dict of strings {synsets, lemmas})
+    """
+    synsets, lemmas, vectors = [], [], []
+    for row in csv.reader(stream):
+        row = row[0].split("__")
+        vect = row[1].split("\t")
+        lemmas.append(vect.pop(0))
+        synsets.append(row[0])
+        vectors.append([float(v) for v in vect if v != ""])
+    return {"normalized_vectors": normalize_rows(vectors)}, {"synsets": synsets, "lemmas": lemmas}
+
+
+def normalize_rows(vectors):
+    """
+    L2 normalize the rows of a matrix (the zero rows are left unchanged)
+    :param vectors: 2D array
+    :return: new float32 array with the normalized rows
+    """
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    vectors /= norms
+    return vectors
+
+
+def write_nasari_binary(file_path, kind, arrays, strings):
+    """
+    Write the parsed nasari resource in the compiled binary format
+    :param file_path: output path
+    :param kind: LEXICAL or EMBEDDED
+    :param arrays: dict{name: numpy array}
+    :param strings: dict{name: list of strings}
+    :return: -
+    """
+    blobs = [(name, "str", None, "\n".join(values).encode("utf8")) for name, values in strings.items()]
+    blobs += [(name, array.dtype.str, list(array.shape), np.ascontiguousarray(array).tobytes())
+              for name, array in arrays.items()]
+    sections, offset = {}, 0
+    for name, dtype, shape, blob in blobs:
+        sections[name] = {"dtype": dtype, "shape": shape, "offset": offset, "length": len(blob)}
+        offset += _padded(len(blob))
+    header = json.dumps({"kind": kind, "sections": sections}).encode("utf8")
+    data_start = _padded(len(MAGIC) + 8 + len(header))
+    with open(file_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, _, _, blob in blobs:
+            f.write(blob)
+            f.write(b"\0" * (_padded(len(blob)) - len(blob)))
+
+
+def read_nasari_binary(file_path):
+    """
+    Memory map a compiled nasari file. The numeric arrays are read-only views on the mapping (no copy)
+    :param file_path: path of the compiled file
+    :return: NasariBinary(kind, dict of arrays, dict of list of strings)
+    """
+    with open(file_path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError("{} is not a compiled nasari file".format(file_path))
+    header_length, = struct.unpack_from("<Q", buffer, len(MAGIC))
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length].decode("utf8"))
+    data_start = _padded(len(MAGIC) + 8 + header_length)
+    arrays, strings = {}, {}
+    for name, section in header["sections"].items():
+        offset = data_start + section["offset"]
+        if section["dtype"] == "str":
+            blob = buffer[offset:offset + section["length"]].decode("utf8")
+            strings[name] = blob.split("\n") if blob else []
+        else:
+            dtype = np.dtype(section["dtype"])
+            count = section["length"] // dtype.itemsize
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(section["shape"])
+    return NasariBinary(header["kind"], arrays, strings)
+
+
+def is_nasari_binary(file_path):
+    """
+    Check if a file is a compiled nasari file
+    :param file_path: the file path
+    :return: boolean
+    """
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def compile_nasari(kind, text_path, binary_path):
+    """
+    One-time compilation of a text nasari file in the binary format
+    :param kind: LEXICAL (summarization format) or EMBEDDED (semantic similarity format)
+    :param text_path: path of the text nasari file
+    :param binary_path: output path
+    :return: -
+    """
+    parse = parse_lexical_nasari if kind == LEXICAL else parse_embedded_nasari
+    with open(text_path, encoding="utf8") as f:
+        arrays, strings = parse(f)
+    write_nasari_binary(binary_path, kind, arrays, strings)
+
+
+def _padded(length):
+    return (length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a text nasari file in the binary format")
+    parser.add_argument("kind", choices=[LEXICAL, EMBEDDED])
+    parser.add_argument("text_path")
+    parser.add_argument("binary_path")
+    args = parser.parse_args()
+    compile_nasari(args.kind, args.text_path, args.binary_path)
@@ -0,0 +1,89 @@
+import numpy as np
+
+from utility.nasari_binary import parse_embedded_nasari, read_nasari_binary, is_nasari_binary, normalize_rows, \
+    EMBEDDED
+
+
+class NasariEmbeddings:
+    """
+    Embedded nasari vectors kept in a contiguous float32 matrix whose rows are L2 normalized,
+    so the cosine similarity of two senses is the dot product of their rows.
+    The vectors of a compiled file are already normalized, so the matrix is the read-only view on the memory mapped
+    file, shared by the processes. The index maps each BabelSynset Id to its (first) row
+    """
+
+    def __init__(self, synsets, lemmas, vectors, normalized=False):
+        """
+        :param synsets: list of BabelSynset Ids, one for each vector
+        :param lemmas: list of lemmas, one for each vector
+        :param vectors: 2D array of the embeddings
+        :param normalized: True if the vectors are float32 and already L2 normalized (they are used without a copy)
+        """
+        self.synsets = synsets
+        self.lemmas = lemmas
+        self.matrix = np.asarray(vectors, dtype=np.float32) if normalized else normalize_rows(vectors)
+        self.index = {}
+        for row, babel_syn_id in enumerate(synsets):
+            self.index.setdefault(babel_syn_id, row)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Load the embedded nasari vectors, from a compiled binary file or from the text release
+        :param file_path: the nasari file path
+        :return: NasariEmbeddings
+        """
+        if is_nasari_binary(file_path):
+            nasari = read_nasari_binary(file_path)
+            if nasari.kind != EMBEDDED:
+                raise ValueError("{} does not contain embedded nasari vectors".format(file_path))
+            arrays, strings = nasari.arrays, nasari.strings
+        else:
+            with open(file_path, encoding="utf8") as f:
+                arrays, strings = parse_embedded_nasari(f)
+        if 'normalized_vectors' in arrays:
+            return cls(strings['synsets'], strings['lemmas'], arrays['normalized_vectors'], normalized=True)
+        return cls(strings['synsets'], strings['lemmas'], arrays['vectors'])  # compiled by an older version
+
+    @classmethod
+    def from_dataframe(cls, nasari_df):
+        """
+        Build the embeddings from a nasari dataframe (BabelSyn, Lemma, Features)
+        :param nasari_df: nasari vector in dataframe form
+        :return: NasariEmbeddings
+        """
+        vectors = [[float(v) for v in features if v != ""] for features in nasari_df['Features']]
+        return cls(list(nasari_df['BabelSyn']), list(nasari_df['Lemma']), vectors)
+
+    def __len__(self):
+        return len(self.synsets)
+
+    def __contains__(self, babel_syn_id):
+        return babel_syn_id in self.index
+
+    def row(self, babel_syn_id):
+        """
+        :param babel_syn_id: BabelSynset Id
+        :return: the row of the sense, None if it has no vector
+        """
+        return self.index.get(babel_syn_id)
+
+    def vector(self, babel_syn_id):
+        """
+        :param babel_syn_id: BabelSynset Id
+        :return: the normalized vector of the sense, None if it has no vector
+        """
+        row = self.index.get(babel_syn_id)
+        if row is not None:
+            return self.matrix[row]
+
+    def cosine_similarity(self, babel_syn_id_1, babel_syn_id_2):
+        """
+        Compute the cosine similarity between two senses as the dot product of their normalized vectors
+        :param babel_syn_id_1: first BabelSynset Id
+        :param babel_syn_id_2: second BabelSynset Id
+        :return: the cosine similarity, None if a sense has no vector
+        """
+        row_1, row_2 = self.index.get(babel_syn_id_1), self.index.get(babel_syn_id_2)
+        if row_1 is not None and row_2 is not None:
+            return float(self.matrix[row_1] @ self.matrix[row_2])
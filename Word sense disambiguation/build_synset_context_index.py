@@ -0,0 +1,15 @@
+"""
+Precompute the normalized context of all the WordNet synsets used by the Lesk algorithm,
+the index is saved in data/synset_context_index.npz and loaded lazily by word_disambiguation_utils
+"""
+
+import time
+
+from word_disambiguation_utils import build_synset_context_index, SYNSET_CONTEXT_INDEX_PATH
+
+if __name__ == "__main__":
+    start = time.time()
+    index = build_synset_context_index()
+    index.save(SYNSET_CONTEXT_INDEX_PATH)
+    print("Indexed {} synsets ({} context words) in {:.1f} s".format(len(index), len(index.vocabulary),
+                                                                     time.time() - start))
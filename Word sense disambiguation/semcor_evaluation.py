@@ -0,0 +1,137 @@
+"""
+Evaluation of the Lesk disambiguation algorithm on every tagged noun of the whole SemCor corpus.
+
+The gold standard (the sentences and their tagged nouns with the WordNet synset) is extracted once walking the
+tagged trees of the corpus, in parallel over the corpus files, and cached on disk. The sentences are then
+disambiguated in parallel chunks, each chunk with a single lesk_batch call.
+
+Usage:
+    python semcor_evaluation.py --processes 8 [--limit 50] [--rebuild-gold]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from nltk import Tree
+from nltk.corpus import semcor, wordnet
+
+from word_disambiguation_batch import warm_up, iter_batches
+from word_disambiguation_utils import lesk_batch
+
+SEMCOR_GOLD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "semcor_gold.json")
+
+
+def extract_tagged_nouns(tagged_sentence):
+    """
+    Walk a SemCor sentence tagged with tag='both' and extract the nouns tagged with a WordNet sense.
+    A tagged word is a tree labelled with its Lemma, containing the tree of the POS with the tokens of the word
+    :param tagged_sentence: list of chunks of semcor.tagged_sents(tag='both')
+    :return: tuple (sentence text, list of (word, gold synset name))
+    """
+    tokens, nouns = [], []
+    for chunk in tagged_sentence:
+        if not isinstance(chunk, Tree):
+            tokens.extend(chunk)
+            continue
+        tokens.extend(chunk.leaves())
+        if not hasattr(chunk.label(), "synset"):
+            continue
+        pos_tree = chunk[0]
+        if isinstance(pos_tree, Tree) and pos_tree.label().startswith("NN"):
+            nouns.append(("_".join(pos_tree.leaves()), chunk.label().synset().name()))
+    return " ".join(tokens), nouns
+
+
+def extract_file_gold(fileid):
+    """
+    Extract the gold standard of a SemCor file
+    :param fileid: the corpus file id
+    :return: list of (sentence, list of (word, gold synset name)), only the sentences with a tagged noun
+    """
+    sentences = (extract_tagged_nouns(tagged_sentence)
+                 for tagged_sentence in semcor.tagged_sents(fileids=fileid, tag='both'))
+    return [(sentence, nouns) for sentence, nouns in sentences if nouns]
+
+
+def load_gold_standard(file_path=SEMCOR_GOLD_PATH, processes=None, rebuild=False):
+    """
+    Load the SemCor gold standard from the cache, extracting it (in parallel over the corpus files) if missing
+    :param file_path: the gold standard cache
+    :param processes: number of worker processes (os.cpu_count() if missing)
+    :param rebuild: extract the gold standard even if cached
+    :return: list of (sentence, list of (word, gold synset name))
+    """
+    if not rebuild and os.path.exists(file_path):
+        with open(file_path) as f:
+            return [(sentence, [tuple(noun) for noun in nouns]) for sentence, nouns in json.load(f)]
+    with multiprocessing.Pool(processes) as pool:
+        gold = [sentence for file_gold in pool.imap(extract_file_gold, semcor.fileids()) for sentence in file_gold]
+    with open(file_path, "w") as f:
+        json.dump(gold, f)
+    return gold
+
+
+def evaluate_chunk(chunk):
+    """
+    Disambiguate all the tagged nouns of a chunk of sentences with a single lesk_batch call
+    :param chunk: tuple (position of the first sentence, list of (sentence, list of (word, gold synset name)))
+    :return: tuple (sentences, nouns, nouns with candidate synsets, correct disambiguations)
+    """
+    _, sentences = chunk
+    pairs, gold = [], []
+    nouns = 0
+    for sentence, tagged_nouns in sentences:
+        for word, gold_name in tagged_nouns:
+            nouns += 1
+            if wordnet.synsets(word):
+                pairs.append((sentence, word))
+                gold.append(gold_name)
+    correct = sum(syn.name() == gold_name for syn, gold_name in zip(lesk_batch(pairs), gold)) if pairs else 0
+    return len(sentences), nouns, len(pairs), correct
+
+
+def evaluate(gold, processes=None, chunk_size=200):
+    """
+    Evaluate the Lesk algorithm on a gold standard, in parallel chunks of sentences
+    :param gold: list of (sentence, list of (word, gold synset name))
+    :param processes: number of worker processes (os.cpu_count() if missing)
+    :param chunk_size: number of sentences sent to a worker at a time
+    :return: dict with the counts, the accuracy and the throughput
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        warm_up()
+        initializer = None
+    else:
+        context = multiprocessing.get_context()
+        initializer = warm_up
+    start = time.time()
+    totals = [0, 0, 0, 0]
+    with context.Pool(processes, initializer=initializer) as pool:
+        for counts in pool.imap_unordered(evaluate_chunk, iter_batches(gold, chunk_size)):
+            totals = [total + count for total, count in zip(totals, counts)]
+    sentences, nouns, attempted, correct = totals
+    elapsed = time.time() - start
+    return {"sentences": sentences, "nouns": nouns, "nouns_with_candidates": attempted, "correct": correct,
+            "accuracy": correct / nouns if nouns else 0,
+            "accuracy_with_candidates": correct / attempted if attempted else 0,
+            "seconds": elapsed, "sentences_per_second": sentences / elapsed if elapsed else 0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lesk accuracy on all the tagged nouns of SemCor")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=200, help="sentences sent to a worker at a time")
+    parser.add_argument("--limit", type=int, default=None, help="evaluate only the first sentences")
+    parser.add_argument("--gold", default=SEMCOR_GOLD_PATH, help="gold standard cache file")
+    parser.add_argument("--rebuild-gold", action="store_true", help="extract the gold standard again")
+    args = parser.parse_args()
+
+    gold_standard = load_gold_standard(args.gold, args.processes, args.rebuild_gold)[:args.limit]
+    report = evaluate(gold_standard, args.processes, args.chunk_size)
+    print("Sentences: {sentences}\nTagged nouns: {nouns} ({nouns_with_candidates} with candidate synsets)\n"
+          "Disambiguation accuracy: {accuracy:.4f} ({accuracy_with_candidates:.4f} on the nouns with candidates)\n"
+          "Throughput: {sentences_per_second:.1f} sentences/s ({seconds:.1f} s)".format(**report))
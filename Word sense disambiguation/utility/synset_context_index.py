@@ -0,0 +1,148 @@
+import numpy as np
+from scipy import sparse
+
+
+class SynsetContextIndex:
+    """
+    Normalized contexts of the WordNet synsets in CSR form: the context of the synset in row i is made of the words
+    vocabulary[indices[indptr[i]:indptr[i + 1]]]
+    """
+
+    def __init__(self, names, vocabulary, indptr, indices):
+        """
+        :param names: list of synset names (e.g. 'dog.n.01'), one for each row
+        :param vocabulary: list of context words
+        :param indptr: row offsets (numpy array)
+        :param indices: word ids (numpy array)
+        """
+        self.names = names
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.rows = {name: i for i, name in enumerate(names)}
+        self.__word_ids = None
+        self.__matrix = None
+
+    @classmethod
+    def from_contexts(cls, contexts):
+        """
+        Build the index
+        :param contexts: iterable of (synset name, iterable of context words)
+        :return: SynsetContextIndex
+        """
+        names, vocabulary, word_ids, indptr, indices = [], [], {}, [0], []
+        for name, context in contexts:
+            names.append(name)
+            indices += sorted(word_ids.setdefault(word, len(word_ids)) for word in set(context))
+            indptr.append(len(indices))
+        vocabulary = list(word_ids)
+        return cls(names, vocabulary, np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int32))
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Load an index saved with save
+        :param file_path: the index file
+        :return: SynsetContextIndex
+        """
+        with np.load(file_path) as data:
+            return cls(_decode(data['names']), _decode(data['vocabulary']), data['indptr'], data['indices'])
+
+    def save(self, file_path):
+        """
+        Save the index in a compressed numpy archive
+        :param file_path: output path
+        :return: -
+        """
+        np.savez_compressed(file_path, names=_encode(self.names), vocabulary=_encode(self.vocabulary),
+                            indptr=self.indptr, indices=self.indices)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    @property
+    def word_ids(self):
+        """
+        :return: dict{context word: word id}
+        """
+        if self.__word_ids is None:
+            self.__word_ids = {word: i for i, word in enumerate(self.vocabulary)}
+        return self.__word_ids
+
+    @property
+    def matrix(self):
+        """
+        :return: the binary synset x context word sparse matrix
+        """
+        if self.__matrix is None:
+            self.__matrix = sparse.csr_matrix((np.ones(len(self.indices), dtype=np.int32), self.indices, self.indptr),
+                                              shape=(len(self.names), len(self.vocabulary)))
+        return self.__matrix
+
+    def context_vector(self, words):
+        """
+        Map a set of words to the sparse indicator row vector of the context vocabulary
+        (the words missing from the vocabulary cannot overlap with any synset and are dropped)
+        :param words: iterable of words
+        :return: sparse 1 x vocabulary matrix
+        """
+        return self.context_matrix([words])
+
+    def context_matrix(self, contexts):
+        """
+        Map a list of word sets to the sparse indicator matrix of the context vocabulary
+        :param contexts: list of iterables of words
+        :return: sparse len(contexts) x vocabulary matrix
+        """
+        word_ids = self.word_ids
+        rows, cols = [], []
+        for r, words in enumerate(contexts):
+            ids = {word_ids[w] for w in words if w in word_ids}
+            rows += [r] * len(ids)
+            cols += ids
+        return sparse.csr_matrix((np.ones(len(cols), dtype=np.int32), (rows, cols)),
+                                 shape=(len(contexts), len(self.vocabulary)))
+
+    def overlap_scores(self, names, words):
+        """
+        Compute the size of the intersection between a context and the context of each given synset,
+        with a single sparse matrix-vector product
+        :param names: list of synset names (all in the index)
+        :param words: the context, iterable of words
+        :return: numpy array of scores, one for each synset
+        """
+        rows = [self.rows[name] for name in names]
+        return np.asarray((self.matrix[rows] @ self.context_vector(words).T).todense()).ravel()
+
+    def batch_overlap_scores(self, names, contexts, context_of_name):
+        """
+        Compute the overlap scores of many (synset, context) pairs at once
+        :param names: list of synset names (all in the index)
+        :param contexts: list of contexts (iterables of words)
+        :param context_of_name: list with the position in contexts of the context of each synset
+        :return: numpy array of scores, one for each synset
+        """
+        rows = [self.rows[name] for name in names]
+        context_rows = self.context_matrix(contexts)[context_of_name]
+        return np.asarray(self.matrix[rows].multiply(context_rows).sum(axis=1)).ravel()
+
+    def context(self, name):
+        """
+        Return the context of a synset
+        :param name: the synset name
+        :return: frozenset of words
+        """
+        row = self.rows[name]
+        return frozenset(self.vocabulary[i] for i in self.indices[self.indptr[row]:self.indptr[row + 1]])
+
+
+def _encode(strings):
+    return np.frombuffer("\n".join(strings).encode("utf8"), dtype=np.uint8)
+
+
+def _decode(array):
+    blob = array.tobytes().decode("utf8")
+    return blob.split("\n") if blob else []
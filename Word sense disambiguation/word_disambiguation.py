@@ -14,6 +14,17 @@ def read_file_lines(file_path):
     return lines
 
 
+def iter_file_lines(file_path):
+    """
+    Stream the lines of a (possibly huge) file, without the line terminator
+    :param file_path: the file path
+    :return: generator of lines
+    """
+    with open(file_path) as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
 def find_ambigous_word(sentence):
     """
     Find the ambiguous word with the pattern **word**
@@ -29,11 +40,12 @@ def find_ambigous_word(sentence):
         return sentence, None
 
 
-sentences = read_file_lines("./data/sentences.txt")
-for s in sentences:
-    s = s.replace("\n", "")
-    s, word_amb = find_ambigous_word(s)
-    syn = lesk(s, word_amb)
-    s_alternatives = generate_alternative_sentence(s, word_amb, syn)
-    print("\nSentence: {}\nSyn: {}\nSyn Definition: {}\nAlternatives sentences:\n{}".
-          format(s, syn, syn.definition(), "".join(s_alternatives)))
+if __name__ == "__main__":
+    sentences = read_file_lines("./data/sentences.txt")
+    for s in sentences:
+        s = s.replace("\n", "")
+        s, word_amb = find_ambigous_word(s)
+        syn = lesk(s, word_amb)
+        s_alternatives = generate_alternative_sentence(s, word_amb, syn)
+        print("\nSentence: {}\nSyn: {}\nSyn Definition: {}\nAlternatives sentences:\n{}".
+              format(s, syn, syn.definition(), "".join(s_alternatives)))
@@ -0,0 +1,151 @@
+"""
+Batch Lesk disambiguation of large files of annotated sentences (the ambiguous word marked as **word**).
+
+The input file is streamed in batches of lines, each batch is disambiguated by a worker process with a single
+lesk_batch call, and the results are written incrementally as JSON lines, in the same order of the input.
+WordNet, the NLTK models and the synset context index are loaded once before the workers are forked,
+so they are shared (copy-on-write) instead of being loaded by every worker.
+Only a bounded number of batches is in flight at a time, so the memory does not grow with the size of the input.
+
+Usage:
+    python word_disambiguation_batch.py ./data/sentences.txt --output senses.jsonl --processes 8
+    python word_disambiguation_batch.py corpus.txt --all-words
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from nltk.corpus import wordnet
+
+from word_disambiguation import iter_file_lines, find_ambigous_word
+from word_disambiguation_utils import lesk_batch, generate_alternative_sentence, disambiguate_all_words, \
+    load_synset_context_index, tag_sentence
+
+
+def warm_up():
+    """
+    Load the lazy resources (WordNet, tokenizer, POS tagger, stopwords, synset context index)
+    :return: -
+    """
+    wordnet.synsets("warm")
+    tag_sentence("The resources of the disambiguation are loaded.")
+    load_synset_context_index()
+
+
+def iter_batches(lines, batch_size):
+    """
+    Group a stream of lines in batches
+    :param lines: iterable of lines
+    :param batch_size: number of lines of each batch
+    :return: generator of tuples (number of the first line, list of lines)
+    """
+    lines = iter(lines)
+    first = 0
+    batch = list(itertools.islice(lines, batch_size))
+    while batch:
+        yield first, batch
+        first += len(batch)
+        batch = list(itertools.islice(lines, batch_size))
+
+
+def disambiguate_lines(batch):
+    """
+    Disambiguate the marked word of each line of a batch, with a single lesk_batch call.
+    The lines without a marked word (or whose word is not in WordNet) are reported with an error
+    :param batch: tuple (number of the first line, list of lines)
+    :return: list of dict with line, sentence, word, synset, definition and alternatives
+    """
+    first, lines = batch
+    results, pairs, positions = [], [], []
+    for n, line in enumerate(lines, first):
+        sentence, word = find_ambigous_word(line)
+        result = {"line": n, "sentence": sentence, "word": word, "synset": None}
+        if word is None:
+            result["error"] = "No ambiguous word"
+        elif not wordnet.synsets(word):
+            result["error"] = "No synset for {}".format(word)
+        else:
+            pairs.append((sentence, word))
+            positions.append(len(results))
+        results.append(result)
+    if pairs:
+        for i, syn in zip(positions, lesk_batch(pairs)):
+            result = results[i]
+            result.update(synset=syn.name(), definition=syn.definition(),
+                          alternatives=generate_alternative_sentence(result["sentence"], result["word"], syn))
+    return results
+
+
+def disambiguate_all_lines(batch):
+    """
+    Disambiguate all the open-class words of each line of a batch (the ** marks are removed)
+    :param batch: tuple (number of the first line, list of lines)
+    :return: list of dict with line, sentence and senses (list of [word, synset])
+    """
+    first, lines = batch
+    sentences = [find_ambigous_word(line)[0] for line in lines]
+    return [{"line": first + i, "sentence": sentences[i], "senses": [[word, syn.name()] for word, syn in senses]}
+            for i, senses in disambiguate_all_words(sentences)]
+
+
+def disambiguate_file(file_path, processes=None, batch_size=256, all_words=False):
+    """
+    Disambiguate the lines of a file with a pool of processes
+    :param file_path: the input file, one sentence for each line
+    :param processes: number of worker processes (os.cpu_count() if missing)
+    :param batch_size: number of lines sent to a worker at a time
+    :param all_words: disambiguate all the open-class words instead of the marked one
+    :return: iterator of the result of each line, in the same order of the input
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        warm_up()
+        initializer = None
+    else:
+        context = multiprocessing.get_context()
+        initializer = warm_up
+    worker = disambiguate_all_lines if all_words else disambiguate_lines
+    max_pending = 2 * (processes or os.cpu_count())
+    with context.Pool(processes, initializer=initializer) as pool:
+        pending = deque()
+        for batch in iter_batches(iter_file_lines(file_path), batch_size):
+            pending.append(pool.apply_async(worker, (batch,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lesk disambiguation of a file of sentences, written as JSON lines")
+    parser.add_argument("input", help="file with one sentence for each line, the ambiguous word marked as **word**")
+    parser.add_argument("--output", default=None, help="output JSONL file (stdout if missing)")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--all-words", action="store_true", help="disambiguate all the open-class words")
+    parser.add_argument("--report-every", type=int, default=10000, help="lines between two throughput reports")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.time()
+    count = 0
+    try:
+        for count, result in enumerate(disambiguate_file(args.input, args.processes, args.batch_size,
+                                                         args.all_words), 1):
+            out.write(json.dumps(result) + "\n")
+            if count % args.report_every == 0:
+                print("{} sentences, {:.1f} sentences/s".format(count, count / (time.time() - start)),
+                      file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.time() - start
+    print("Disambiguated {} sentences in {:.1f} s ({:.1f} sentences/s)".format(count, elapsed,
+                                                                             count / elapsed if elapsed else 0),
+          file=sys.stderr)
@@ -1,12 +1,20 @@
+import functools
+import multiprocessing
+import os
 import string
 import inflect
 from nltk import word_tokenize, pos_tag
 from nltk.corpus import wordnet, stopwords
 
-from utility.lemmatization_utility import lemmatize_word
+from utility.lemmatization_utility import lemmatize_word, get_wordnet_pos
+from utility.synset_context_index import SynsetContextIndex
 
 inflect = inflect.engine()
 
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+SYNSET_CONTEXT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "synset_context_index.npz")
+
 
 def normalize_sentence(sentence):
     """
@@ -14,16 +22,33 @@ def normalize_sentence(sentence):
     :param sentence: the input sentence
     :return: the normalized sentence
     """
-    sentence = sentence.translate(str.maketrans('', '', string.punctuation))
+    return [lemma for _, _, lemma in tag_sentence(sentence)]
+
+
+def tag_sentence(sentence):
+    """
+    Normalize a sentence (removing punctuation, uppercase letters and stopwords) keeping the POS of each word
+    :param sentence: the input sentence
+    :return: list of tuples (word, PennTreebank POS tag, lemma)
+    """
+    sentence = sentence.translate(PUNCTUATION_TABLE)
     sentence = sentence.lower()
     words_token = word_tokenize(sentence)
     pos_tag_dict = dict(pos_tag(words_token))
-    splitted_text = [lemmatize_word(w, pos_tag_dict[w]).lower() for w in words_token
-                     if w not in stopwords.words("english")]
-    return splitted_text
+    stop_words = english_stopwords()
+    return [(w, pos_tag_dict[w], lemmatize_word(w, pos_tag_dict[w]).lower()) for w in words_token
+            if w not in stop_words]
 
 
-def get_synset_context(syn):
+@functools.lru_cache(maxsize=None)
+def english_stopwords():
+    """
+    :return: the set of the english stopwords, built once
+    """
+    return frozenset(stopwords.words("english"))
+
+
+def compute_synset_context(syn):
     """
     Givene a synset generate a context, extracting the definition, the examples and the gloss
     :param syn: the synset
@@ -33,6 +58,47 @@ def get_synset_context(syn):
     return set(sentence_context) | set(syn.lemma_names())
 
 
+def get_synset_context(syn):
+    """
+    Return the context of a synset, from the precomputed synset context index if available
+    :param syn: the synset
+    :return: set, the context
+    """
+    index = load_synset_context_index()
+    if index is not None and syn.name() in index:
+        return index.context(syn.name())
+    return compute_synset_context(syn)
+
+
+@functools.lru_cache(maxsize=None)
+def load_synset_context_index(file_path=SYNSET_CONTEXT_INDEX_PATH):
+    """
+    Lazily load the synset context index (built with build_synset_context_index.py)
+    :param file_path: the index file
+    :return: SynsetContextIndex, or None if the index has not been built
+    """
+    if not os.path.exists(file_path):
+        return None
+    return SynsetContextIndex.load(file_path)
+
+
+def build_synset_context_index(processes=None, chunksize=500):
+    """
+    Normalize the context of all the WordNet synsets, in parallel
+    :param processes: number of worker processes (os.cpu_count() if missing)
+    :param chunksize: number of synsets sent to a worker at a time
+    :return: SynsetContextIndex
+    """
+    names = [syn.name() for syn in wordnet.all_synsets()]
+    with multiprocessing.Pool(processes) as pool:
+        contexts = pool.imap(_synset_context_by_name, names, chunksize)
+        return SynsetContextIndex.from_contexts(zip(names, contexts))
+
+
+def _synset_context_by_name(name):
+    return compute_synset_context(wordnet.synset(name))
+
+
 def lesk(sentence, ambiguous_word):
     """
     Given a sentence (the context) and an ambiguous word, the most probable sense,
@@ -42,12 +108,94 @@ def lesk(sentence, ambiguous_word):
     :return: Most probable synset for the ambiguos word
     """
     target_synsets = wordnet.synsets(ambiguous_word)
-    sentence = normalize_sentence(sentence)
-    context = set(sentence)
-    intersection_c, sense = max([(len(context.intersection(get_synset_context(syn))), syn) for syn in target_synsets])
+    context = set(normalize_sentence(sentence))
+    return select_sense(target_synsets, lesk_scores(context, target_synsets))
+
+
+def lesk_batch(sentences_words):
+    """
+    Lesk algorithm for a batch of (sentence, ambiguous word) pairs: each distinct sentence is normalized once and,
+    if the synset context index is available, the scores of all the candidate synsets of all the pairs are
+    computed with a single sparse matrix product
+    :param sentences_words: list of tuples (sentence, ambiguous word)
+    :return: list with the most probable synset of each pair
+    """
+    contexts, context_ids = [], {}
+    for sentence, _ in sentences_words:
+        if sentence not in context_ids:
+            context_ids[sentence] = len(contexts)
+            contexts.append(set(normalize_sentence(sentence)))
+    candidates = [wordnet.synsets(word) for _, word in sentences_words]
+    index = load_synset_context_index()
+    if index is None or not all(syn.name() in index for target_synsets in candidates for syn in target_synsets):
+        return [select_sense(target_synsets, lesk_scores(contexts[context_ids[sentence]], target_synsets))
+                for (sentence, _), target_synsets in zip(sentences_words, candidates)]
+    names = [syn.name() for target_synsets in candidates for syn in target_synsets]
+    context_of_name = [context_ids[sentence] for (sentence, _), target_synsets in zip(sentences_words, candidates)
+                       for _ in target_synsets]
+    scores = index.batch_overlap_scores(names, contexts, context_of_name).tolist()
+    senses, start = [], 0
+    for target_synsets in candidates:
+        senses.append(select_sense(target_synsets, scores[start:start + len(target_synsets)]))
+        start += len(target_synsets)
+    return senses
+
+
+def disambiguate_all_words(sentences):
+    """
+    All-words disambiguation: every open-class word (noun, verb, adjective, adverb) of each sentence is
+    disambiguated with the Lesk algorithm. Each sentence is normalized and POS tagged once and its context is shared
+    by all its words, whose candidate synsets (restricted to the POS of the word when possible) are scored together.
+    The sentences are processed lazily, so large inputs can be streamed
+    :param sentences: iterable of sentences
+    :return: generator of tuples (sentence index, list of (word, synset))
+    """
+    for i, sentence in enumerate(sentences):
+        tagged_words = tag_sentence(sentence)
+        context = {lemma for _, _, lemma in tagged_words}
+        words, candidates = [], []
+        for word, tag, lemma in tagged_words:
+            pos = get_wordnet_pos(tag)
+            if pos is None:
+                continue
+            target_synsets = wordnet.synsets(lemma, pos) or wordnet.synsets(word)
+            if target_synsets:
+                words.append(word)
+                candidates.append(target_synsets)
+        scores = lesk_scores(context, [syn for target_synsets in candidates for syn in target_synsets])
+        disambiguations, start = [], 0
+        for word, target_synsets in zip(words, candidates):
+            disambiguations.append((word, select_sense(target_synsets, scores[start:start + len(target_synsets)])))
+            start += len(target_synsets)
+        yield i, disambiguations
+
+
+def lesk_scores(context, target_synsets):
+    """
+    Compute the size of the intersection between the context and the context of each candidate synset.
+    With the synset context index the scores come from a single sparse matrix-vector product
+    :param context: set of normalized words
+    :param target_synsets: the candidate synsets
+    :return: list of scores
+    """
+    index = load_synset_context_index()
+    if index is not None and all(syn.name() in index for syn in target_synsets):
+        return index.overlap_scores([syn.name() for syn in target_synsets], context).tolist()
+    return [len(context.intersection(get_synset_context(syn))) for syn in target_synsets]
+
+
+def select_sense(target_synsets, scores):
+    """
+    Select the synset with the max score, the ties are broken as comparing (score, synset) tuples
+    (i.e. in favour of the greatest synset name), and the first synset is returned if no synset overlaps
+    :param target_synsets: the candidate synsets
+    :param scores: the score of each synset
+    :return: the selected synset
+    """
+    intersection_c = max(scores)
     if intersection_c == 0:
         return target_synsets[0]
-    return sense
+    return max(syn for syn, score in zip(target_synsets, scores) if score == intersection_c)
 
 
 def generate_alternative_sentence(sentence, ambiguous_word, syn):
@@ -59,17 +207,44 @@ def generate_alternative_sentence(sentence, ambiguous_word, syn):
     :param syn: the synset
     :return: a list of alternatives
     """
+    return list(iter_alternative_sentences(sentence, ambiguous_word, syn))
+
+
+def iter_alternative_sentences(sentence, ambiguous_word, syn):
+    """
+    Lazily generate the alternative sentences given an ambiguous word and the relative synset id.
+    The sentence is split once around the ambiguous word and each alternative joins the parts with a synonym
+    :param sentence: the input sentence
+    :param ambiguous_word: the ambiguous word
+    :param syn: the synset
+    :return: generator of alternatives
+    """
+    is_word_capitalized, is_word_plural, word_version = word_versions(ambiguous_word)
+    synonyms = set(syn.lemma_names()) - word_version
+    parts = sentence.split(ambiguous_word)
+    for lm in synonyms:
+        yield inflect_word(lm, is_word_capitalized, is_word_plural).join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def word_versions(ambiguous_word):
+    """
+    Return the capitalization, the number and the inflected versions of a word
+    :param ambiguous_word: the word
+    :return: tuple (capitalized, plural, frozenset of the singular and plural, lowercase and capitalized versions)
+    """
     is_word_capitalized = ambiguous_word == ambiguous_word.capitalize()
     ambiguous_word_n = ambiguous_word.lower()
-    is_word_plural = inflect.singular_noun(ambiguous_word_n) is not False
+    singular = singular_noun(ambiguous_word_n)
+    is_word_plural = singular is not False
     if is_word_plural:
-        ambiguous_word_n = inflect.singular_noun(ambiguous_word_n)
-    word_version = [ambiguous_word_n, ambiguous_word_n.capitalize(), inflect.plural(ambiguous_word_n),
-                    inflect.plural(ambiguous_word_n).capitalize()]
-    synonyms = set(syn.lemma_names()) - set(word_version)
-    return [sentence.replace(ambiguous_word, inflect_word(lm, is_word_capitalized, is_word_plural)) for lm in synonyms]
+        ambiguous_word_n = singular
+    word_plural = pluralize(ambiguous_word_n)
+    word_version = frozenset([ambiguous_word_n, ambiguous_word_n.capitalize(), word_plural, word_plural.capitalize()])
+    return is_word_capitalized, is_word_plural, word_version
 
 
+@functools.lru_cache(maxsize=None)
 def inflect_word(word, capitalize, plural):
     """
     Capitalize and set the word to plural
@@ -81,5 +256,36 @@ def inflect_word(word, capitalize, plural):
     if capitalize:
         word = word.capitalize()
     if plural:
-        word = inflect.plural(word)
+        word = pluralize(word)
     return word
+
+
+@functools.lru_cache(maxsize=None)
+def singular_noun(word):
+    """
+    Memoized singular of a noun
+    :param word: the noun
+    :return: the singular, False if the noun is already singular
+    """
+    return inflect.singular_noun(word)
+
+
+@functools.lru_cache(maxsize=None)
+def pluralize(word):
+    """
+    Memoized plural of a word
+    :param word: the word
+    :return: the plural
+    """
+    return inflect.plural(word)
+
+
+def precompute_inflections(words=None):
+    """
+    Fill the plural tables of the words that can be generated as synonyms (lowercase and capitalized)
+    :param words: iterable of words, all the WordNet lemma names if missing
+    :return: -
+    """
+    for word in words if words is not None else wordnet.all_lemma_names():
+        pluralize(word)
+        pluralize(word.capitalize())